@@ -0,0 +1,83 @@
+"""Compare the widget and canvas renderers: widget count and the cost of a text/font update plus relayout
+
+Each update pulses the status icon's font and changes the countdown text, as the animation
+and the 1 Hz tick do, then lets Tk finish the resulting geometry work (update_idletasks).
+Run from the repository root:
+
+    xvfb-run python benchmarks/bench_layout.py --real-tk   # widget count and relayout time
+    python benchmarks/bench_layout.py                      # stub Tk: widget count and Tk calls only
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+RENDERERS = ('widgets', 'canvas')
+
+
+def count_widgets(widget):
+    """The widget and all of its descendants"""
+    return 1 + sum(count_widgets(child) for child in widget.winfo_children())
+
+
+def run_renderer(tk, bus_tracker_ui, sources, renderer, updates):
+    clock = sources.VirtualClock(speed=None)
+    root = tk.Tk()
+    app = bus_tracker_ui.MunichBusTracker(root, history=False, source=sources.SyntheticSource(clock), clock=clock,
+                                          renderer=renderer)
+    app.update_departures(app.engine.fetch_snapshot())
+    root.update_idletasks()
+
+    calls_before = sum(tk.calls.values()) if hasattr(tk, 'calls') else None
+    times = []
+    for i in range(updates):
+        started = time.perf_counter()
+        app.set_widget(app.status_icon, font=('Helvetica', 28 + i % 5, 'bold'))
+        app.set_widget(app.countdown_label, text=f">>> {i % 60} MIN REMAINING <<<")
+        root.update_idletasks()
+        times.append((time.perf_counter() - started) * 1000)
+
+    result = {
+        'renderer': renderer,
+        'widgets': count_widgets(root),
+        'update_ms': round(statistics.median(times), 4),
+        'update_max_ms': round(max(times), 4),
+        'tk_calls_per_update': None if calls_before is None else
+        round((sum(tk.calls.values()) - calls_before) / updates, 2),
+    }
+    app.engine.stop()
+    app.frame_scheduler.stop()
+    root.destroy()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--updates', type=int, default=500, help="font/text updates per renderer")
+    parser.add_argument('--real-tk', action='store_true', help="use the real tkinter (needs a display)")
+    args = parser.parse_args()
+
+    if not args.real_tk:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import stub_tk
+        stub_tk.install()
+    import tkinter as tk
+    import bus_tracker_ui
+    import bus_tracker_sources as sources
+
+    results = {
+        'tk': 'real' if args.real_tk else 'stub',
+        'updates': args.updates,
+        'renderers': [run_renderer(tk, bus_tracker_ui, sources, renderer, args.updates) for renderer in RENDERERS],
+    }
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+"""Benchmark one refresh cycle: fetch -> filter -> render, plus animation frame cost
+
+Runs headless against a stubbed Tk and synthetic MVG-shaped departures, across
+departure counts and watched-station counts. Run from the repository root:
+
+    python benchmarks/bench_pipeline.py                                # print results as JSON
+    python benchmarks/bench_pipeline.py --save benchmarks/baseline.json
+    python benchmarks/bench_pipeline.py --compare benchmarks/baseline.json  # exit 1 on regressions
+
+With a display (or under xvfb-run), --real-tk measures against the real Tk instead.
+"""
+import os
+import sys
+import gc
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_ROWS = (10, 100, 1000, 10000)
+DEFAULT_STATIONS = (1, 5, 50)
+# Compared metrics: best-of-N times are far less noisy than medians on shared machines
+METRICS = ('get_departures_min_ms', 'render_full_min_ms', 'render_tick_min_ms', 'frame_ms', 'scroll_ms', 'filter_ms')
+
+
+def calibrate():
+    """Milliseconds for a fixed pure-Python workload, as a machine speed yardstick"""
+    best = None
+    for _ in range(5):
+        started = time.perf_counter()
+        total = 0
+        for i in range(200000):
+            total += i % 7
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def synthetic_raw_departures(station, count, now, seed=0):
+    """MVG-API-shaped departures for one station: four destinations, half of them watched"""
+    rnd = random.Random(f'{seed}:{station}')
+    departures = []
+    for i in range(count):
+        planned = int(now) + 60 + i * 30
+        departures.append({
+            'plannedDepartureTime': planned * 1000,
+            'realtimeDepartureTime': (planned + rnd.choice((0, 0, 30, 60, 120))) * 1000,
+            'label': f'X{200 + i % 12}',
+            'destination': f'Destination {i % 4}',
+            'transportType': 'REGIONAL_BUS',
+            'cancelled': False,
+            'messages': [],
+        })
+    return departures
+
+
+def measure(function, repeat, setup=None):
+    """Median and minimum wall time in ms over repeat runs, after one untimed warm-up run"""
+    if setup:
+        setup()
+    function()
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times), min(times)
+
+
+def count_tk_calls(tk, function):
+    """Widget calls made by function (stub Tk only; None with the real Tk)"""
+    if not hasattr(tk, 'calls'):
+        function()
+        return None
+    before = sum(tk.calls.values())
+    function()
+    return sum(tk.calls.values()) - before
+
+
+def run_case(tk, bus_tracker_ui, bus_tracker_board, core, sources, rows, stations, repeat):
+    clock = sources.VirtualClock(speed=None)
+    now = clock.time()
+    per_station = max(1, rows // stations)
+    pages = {f'Station {s}': synthetic_raw_departures(s, per_station, now) for s in range(stations)}
+
+    class BenchSource(core.DepartureSource):
+        def station(self, query):
+            return {'id': query, 'name': query}
+
+        def raw_departures(self, station_id, limit=10, offset=0, transport_types=None):
+            return pages[station_id]
+
+    watch_list = [core.make_watch_entry(name, ['Destination 0', 'Destination 1'], 5) for name in pages]
+    root = tk.Tk()
+    app = bus_tracker_ui.MunichBusTracker(root, watch_list=watch_list, history=False,
+                                          source=BenchSource(), clock=clock)
+    engine = app.engine
+    # One page per station holding every row, and no early stop
+    engine.departure_pager.page_size = per_station
+    engine.departure_pager.max_pages = 1
+    engine.wanted_departures = per_station
+
+    fetch_ms, fetch_min = measure(engine.get_departures, repeat, setup=engine.departure_cache.clear)
+    snapshot = engine.fetch_snapshot()
+
+    def fresh_listbox():
+        app.departures_listbox.delete(0, tk.END)
+        app.departures_board.renderer = bus_tracker_board.ListboxRenderer(app.departures_listbox)
+        app.widget_state.clear()
+
+    full_ms, full_min = measure(lambda: app.update_departures(snapshot), repeat, setup=fresh_listbox)
+    # The 1 Hz countdown tick re-renders the cached snapshot
+    tick_ms, tick_min = measure(app.render_countdowns, repeat)
+
+    # Paging through the virtualized board and re-filtering it by destination, per operation
+    board = app.departures_board
+    pages = max(1, len(board.view) // board.visible_rows())
+    started = time.perf_counter()
+    for page in range(pages * 2):
+        board.scroll(board.visible_rows() if page < pages else -board.visible_rows())
+    scroll_ms = (time.perf_counter() - started) * 1000 / (pages * 2)
+    _, filter_ms = measure(lambda: (board.set_filter('Destination 1'), board.set_filter('')), repeat)
+    filter_ms /= 2
+
+    frames = 360
+    started = time.perf_counter()
+    for frame in range(frames):
+        app.animate_cyberpunk_ui(frame)
+    frame_ms = (time.perf_counter() - started) * 1000 / frames
+
+    fresh_listbox()
+    tk_calls_full = count_tk_calls(tk, lambda: app.update_departures(snapshot))
+    tk_calls_tick = count_tk_calls(tk, app.render_countdowns)
+
+    engine.stop()
+    app.frame_scheduler.stop()
+    root.destroy()
+    return {
+        'case': f'rows={rows},stations={stations}',
+        'rows': per_station * stations,
+        'stations': stations,
+        'matched_rows': len(snapshot.departures),
+        'get_departures_ms': round(fetch_ms, 3),
+        'get_departures_min_ms': round(fetch_min, 3),
+        'render_full_ms': round(full_ms, 3),
+        'render_full_min_ms': round(full_min, 3),
+        'render_tick_ms': round(tick_ms, 3),
+        'render_tick_min_ms': round(tick_min, 3),
+        'frame_ms': round(frame_ms, 4),
+        'scroll_ms': round(scroll_ms, 4),
+        'filter_ms': round(filter_ms, 4),
+        'tk_calls_full': tk_calls_full,
+        'tk_calls_tick': tk_calls_tick,
+    }
+
+
+def merge_best(best, cases):
+    """Keep the fastest value of every compared metric across whole-suite runs"""
+    if not best:
+        return cases
+    for old, new in zip(best, cases):
+        for metric in METRICS:
+            old[metric] = min(old[metric], new[metric])
+    return best
+
+
+def compare(results, baseline, tolerance, floor_ms, normalize=False):
+    """Regressions: metrics slower than baseline by more than tolerance"""
+    # Scaling by the calibration loop helps across different machines but adds noise on the same one
+    scale = results['calibration_ms'] / baseline['calibration_ms'] if normalize else 1.0
+    old_cases = {case['case']: case for case in baseline['cases']}
+    regressions = []
+    for case in results['cases']:
+        old = old_cases.get(case['case'])
+        if not old:
+            continue
+        for metric in METRICS:
+            if metric not in old:
+                continue
+            expected = old[metric] * scale
+            if case[metric] > expected * (1 + tolerance) and case[metric] - expected > floor_ms:
+                regressions.append({'case': case['case'], 'metric': metric, 'baseline': round(expected, 3),
+                                    'current': case[metric], 'ratio': round(case[metric] / expected, 2)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS, help="departures per refresh")
+    parser.add_argument('--stations', type=int, nargs='+', default=DEFAULT_STATIONS, help="watched stations")
+    parser.add_argument('--repeat', type=int, default=9, help="runs per measurement (median reported)")
+    parser.add_argument('--runs', type=int, default=3, help="whole-suite runs; the best of each metric counts")
+    parser.add_argument('--real-tk', action='store_true', help="use the real tkinter (needs a display)")
+    parser.add_argument('--save', metavar='FILE', help="write results to FILE (e.g. a new baseline)")
+    parser.add_argument('--compare', metavar='FILE', help="compare with a baseline; exit 1 on regressions")
+    parser.add_argument('--tolerance', type=float, default=0.5, help="allowed slowdown before flagging (0.5 = 50%%)")
+    parser.add_argument('--normalize', action='store_true',
+                        help="scale the baseline by relative machine speed (comparing across machines)")
+    parser.add_argument('--floor-ms', type=float, default=0.25, help="ignore differences smaller than this (ms)")
+    args = parser.parse_args()
+
+    if not args.real_tk:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import stub_tk
+        stub_tk.install()
+    import tkinter as tk
+    import bus_tracker_ui
+    import bus_tracker_board
+    import bus_tracker_core as core
+    import bus_tracker_sources as sources
+
+    # Keep collector pauses out of the timings
+    gc.collect()
+    gc.disable()
+    results = {
+        'tk': 'real' if args.real_tk else 'stub',
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'runs': args.runs,
+        'calibration_ms': None,
+        'cases': [],
+    }
+    for _ in range(args.runs):
+        calibration = round(calibrate(), 3)
+        results['calibration_ms'] = min(results['calibration_ms'] or calibration, calibration)
+        cases = []
+        for stations in args.stations:
+            for rows in args.rows:
+                if rows < stations:
+                    continue
+                cases.append(run_case(tk, bus_tracker_ui, bus_tracker_board, core, sources, rows, stations, args.repeat))
+                gc.collect()
+        results['cases'] = merge_best(results['cases'], cases)
+    gc.enable()
+
+    exit_code = 0
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        results['regressions'] = compare(results, baseline, args.tolerance, args.floor_ms, args.normalize)
+        exit_code = 1 if results['regressions'] else 0
+
+    output = json.dumps(results, indent=2)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    print(output)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
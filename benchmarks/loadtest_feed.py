@@ -0,0 +1,137 @@
+"""Load test for the snapshot feed: hundreds of SSE subscribers on one publishing tracker
+
+Run from the repository root:
+
+    python benchmarks/loadtest_feed.py --subscribers 500 --snapshots 20
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import selectors
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bus_tracker_core import DepartureSnapshot, freeze_departures  # noqa: E402
+from bus_tracker_server import SnapshotHub, SnapshotServer  # noqa: E402
+
+
+def fake_snapshot(now, count):
+    """A snapshot shaped like a busy multi-station poll"""
+    departures = [{
+        'time': int(now) + 60 * i, 'planned': int(now) + 60 * i, 'line': f'X{i % 7}',
+        'destination': 'Garching, Forschungszentrum (U)', 'type': 'Regionalbus', 'icon': 'mdi:bus',
+        'cancelled': False, 'messages': [], 'station': f'Station {i % 5}', 'walk_time_minutes': 5,
+        'leave_time': int(now) + 60 * i - 300, 'leave_predicted': False, 'leave_confidence': None,
+    } for i in range(count)]
+    return DepartureSnapshot(freeze_departures(departures), now, None, (1, 0))
+
+
+class Subscriber:
+    """One non-blocking SSE connection that records when each event id arrives"""
+
+    def __init__(self, address):
+        self.sock = socket.create_connection(address)
+        self.sock.sendall(b'GET /events HTTP/1.1\r\nHost: loadtest\r\nAccept: text/event-stream\r\n\r\n')
+        self.sock.setblocking(False)
+        self.buffer = b''
+        self.received = {}  # event id -> arrival time
+
+    def on_readable(self):
+        chunk = self.sock.recv(65536)
+        if not chunk:
+            return False
+        now = time.perf_counter()
+        self.buffer += chunk
+        *events, self.buffer = self.buffer.split(b'\n\n')
+        for event in events:
+            for line in event.split(b'\n'):
+                if line.startswith(b'id:'):
+                    self.received[int(line[3:])] = now
+        return True
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--subscribers', type=int, default=300)
+    parser.add_argument('--snapshots', type=int, default=20, help="snapshots to publish (one upstream poll each)")
+    parser.add_argument('--interval', type=float, default=0.25, help="seconds between snapshots")
+    parser.add_argument('--departures', type=int, default=40, help="departures per snapshot")
+    args = parser.parse_args()
+
+    hub = SnapshotHub()
+    server = SnapshotServer(('127.0.0.1', 0), hub)
+    server.start()
+    address = server.server_address
+    threads_before = threading.active_count()
+
+    started = time.perf_counter()
+    subscribers = [Subscriber(address) for _ in range(args.subscribers)]
+    selector = selectors.DefaultSelector()
+    for subscriber in subscribers:
+        selector.register(subscriber.sock, selectors.EVENT_READ, subscriber)
+    connect_s = time.perf_counter() - started
+
+    published = {}
+    done = threading.Event()
+
+    def publish():
+        # Let every subscriber reach its wait before the first snapshot
+        time.sleep(0.5)
+        for _ in range(args.snapshots):
+            hub.publish(fake_snapshot(time.time(), args.departures), next_fetch_in=10)
+            published[hub.version] = time.perf_counter()
+            time.sleep(args.interval)
+        done.set()
+
+    publisher = threading.Thread(target=publish)
+    publisher.start()
+    closed = 0
+    deadline = None
+    while True:
+        for key, _ in selector.select(timeout=0.1):
+            if not key.data.on_readable():
+                selector.unregister(key.fileobj)
+                closed += 1
+        if done.is_set():
+            deadline = deadline or time.perf_counter() + 2
+            complete = all(len(s.received) >= args.snapshots for s in subscribers)
+            if complete or time.perf_counter() > deadline:
+                break
+    server_threads = threading.active_count() - threads_before
+
+    latencies = [(arrived - published[version]) * 1000
+                 for s in subscribers for version, arrived in s.received.items() if version in published]
+    delivered = sum(len(s.received) for s in subscribers)
+    server.stop()
+    for subscriber in subscribers:
+        subscriber.sock.close()
+
+    print(json.dumps({
+        'subscribers': args.subscribers,
+        'snapshots': args.snapshots,
+        'upstream_polls': args.snapshots,
+        'payload_bytes': len(hub.body),
+        'connect_s': round(connect_s, 3),
+        'server_threads': server_threads,
+        'delivered': delivered,
+        'expected': args.subscribers * args.snapshots,
+        'dropped_connections': closed,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.5), 2),
+            'p95': round(percentile(latencies, 0.95), 2),
+            'max': round(max(latencies), 2),
+        } if latencies else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
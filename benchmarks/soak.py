@@ -0,0 +1,202 @@
+"""Soak the UI against synthetic departures on a fast virtual clock and fail on unbounded growth
+
+The tracker runs for --duration wall seconds while its clock runs --speed times faster, so an
+hour of soak covers about four days of departures, polls and LEAVE NOW show/hide cycles.
+The harness also clicks REFRESH, filters the board, toggles the F12 overlay and minimizes and
+restores the window. Every --sample-every seconds it records:
+
+    after_callbacks   pending Tcl after/after_idle callbacks (leaked or stacked animation chains)
+    widgets           the root window and all of its descendants
+    threads           live Python threads
+    objects           objects tracked by the garbage collector
+    rss_mb            resident set size
+
+After a warm-up, the maximum of each series over the last third of the run may not exceed its
+maximum over the first third by more than a small slack (SLACK). Run from the repository root:
+
+    python benchmarks/soak.py --duration 600                  # stub Tk; its timers run at --speed too
+    xvfb-run python benchmarks/soak.py --real-tk --duration 3600
+
+Real Tk timers cannot be sped up, so with --real-tk only the clock and the polling run faster.
+Exits 1 when a series keeps growing.
+"""
+import os
+import sys
+import gc
+import json
+import time
+import argparse
+import threading
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Allowed rise of the late maximum over the early one: absolute amount plus a fraction of the early maximum
+SLACK = {
+    'after_callbacks': (2, 0.0),  # a refresh feedback or focus check may be in flight at a sample
+    'widgets': (0, 0.0),
+    'threads': (1, 0.0),
+    'objects': (0, 0.02),
+    'rss_mb': (8.0, 0.05),
+}
+
+# Interactions replayed in turn, one every --poke-every seconds
+ACTIONS = (
+    ('refresh', lambda app: app.manual_refresh()),
+    ('filter', lambda app: app.departures_board.set_filter('X201')),
+    ('unfilter', lambda app: app.departures_board.set_filter('')),
+    ('overlay_on', lambda app: app.toggle_debug_overlay()),
+    ('overlay_off', lambda app: app.toggle_debug_overlay()),
+    ('minimize', lambda app: app.on_window_unmap(SimpleNamespace(widget=app.root))),
+    ('restore', lambda app: app.on_window_map(SimpleNamespace(widget=app.root))),
+    ('focus', lambda app: app.on_focus_change(None)),
+)
+
+
+def count_widgets(widget):
+    """The widget and all of its descendants"""
+    return 1 + sum(count_widgets(child) for child in widget.winfo_children())
+
+
+def rss_mb():
+    """Current resident set size; the peak where /proc is missing (macOS), None on Windows"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def sample(root, started):
+    """One reading of every tracked series"""
+    return {
+        't': round(time.monotonic() - started, 2),
+        'after_callbacks': len(root.tk.splitlist(root.tk.call('after', 'info'))),
+        'widgets': count_widgets(root),
+        'threads': threading.active_count(),
+        'objects': len(gc.get_objects()),
+        'rss_mb': rss_mb(),
+    }
+
+
+def find_growth(samples, warmup):
+    """Per series: early and late maxima after the warm-up, the allowed limit and whether it was passed"""
+    steady = [s for s in samples if s['t'] >= warmup]
+    third = len(steady) // 3
+    if third < 2:
+        raise ValueError("too few samples after the warm-up; run longer or sample more often")
+    early, late = steady[:third], steady[-third:]
+    report = {}
+    for name, (absolute, fraction) in SLACK.items():
+        early_values = [s[name] for s in early if s[name] is not None]
+        late_values = [s[name] for s in late if s[name] is not None]
+        if not early_values or not late_values:
+            continue
+        early_max, late_max = max(early_values), max(late_values)
+        limit = early_max + absolute + early_max * fraction
+        report[name] = {
+            'first': None if steady[0][name] is None else round(steady[0][name], 2),
+            'early_max': round(early_max, 2),
+            'late_max': round(late_max, 2),
+            'limit': round(limit, 2),
+            'grew': late_max > limit,
+        }
+    return report
+
+
+def soak(tk, bus_tracker_ui, sources, args):
+    """Run the app, poke it and sample it; returns (samples, LEAVE NOW cycles, actions run)"""
+    clock = sources.VirtualClock(speed=args.speed)
+    source = sources.SyntheticSource(clock, lines=[(f'X{200 + i}', 'Garching, Forschungszentrum (U)')
+                                                   for i in range(args.lines)])
+    root = tk.Tk()
+    app = bus_tracker_ui.MunichBusTracker(root, history=False, source=source, clock=clock,
+                                          profile=args.profile, renderer=args.renderer)
+
+    # Count alerts as they open; a stacked flash loop would show up in after_callbacks
+    cycles = [0]
+    show_alert = app.show_leave_now_alert
+
+    def counting_show_alert(message):
+        if not app.leave_now_active:
+            cycles[0] += 1
+        show_alert(message)
+
+    app.show_leave_now_alert = counting_show_alert
+
+    samples, actions = [], 0
+    started = time.monotonic()
+    next_sample = next_poke = started
+    try:
+        while True:
+            root.update()
+            now = time.monotonic()
+            if now >= next_sample:
+                samples.append(sample(root, started))
+                next_sample += args.sample_every
+                if args.series:
+                    with open(args.series, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(samples[-1]) + '\n')
+            if now - started >= args.duration:
+                break
+            if now >= next_poke:
+                ACTIONS[actions % len(ACTIONS)][1](app)
+                actions += 1
+                next_poke += args.poke_every
+            time.sleep(0.002)
+    finally:
+        app.shutdown()
+    return samples, cycles[0], actions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--duration', type=float, default=600, help="wall seconds to run")
+    parser.add_argument('--speed', type=float, default=100, help="virtual clock speed-up")
+    parser.add_argument('--sample-every', type=float, default=5, help="wall seconds between samples")
+    parser.add_argument('--poke-every', type=float, default=2, help="wall seconds between simulated interactions")
+    parser.add_argument('--warmup', type=float, default=30, help="wall seconds ignored before judging growth")
+    parser.add_argument('--lines', type=int, default=3, help="synthetic lines at the watched station")
+    parser.add_argument('--profile', default='full', help="performance profile (full has the most animation)")
+    parser.add_argument('--renderer', choices=('widgets', 'canvas'), default='widgets')
+    parser.add_argument('--series', metavar='FILE', help="also append every sample to FILE as JSON lines")
+    parser.add_argument('--real-tk', action='store_true', help="use the real tkinter (needs a display)")
+    args = parser.parse_args()
+
+    if not args.real_tk:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import stub_tk
+        stub_tk.install()
+        stub_tk.TIME_SCALE = args.speed
+    import tkinter as tk
+    import bus_tracker_ui
+    import bus_tracker_sources as sources
+
+    samples, cycles, actions = soak(tk, bus_tracker_ui, sources, args)
+    try:
+        growth = find_growth(samples, args.warmup)
+    except ValueError as e:
+        parser.error(str(e))
+    results = {
+        'tk': 'real' if args.real_tk else 'stub',
+        'duration_s': args.duration,
+        'virtual_hours': round(args.duration * args.speed / 3600, 1),
+        'samples': len(samples),
+        'leave_now_cycles': cycles,
+        'actions': actions,
+        'series': growth,
+        'grew': sorted(name for name, series in growth.items() if series['grew']),
+    }
+    print(json.dumps(results, indent=2))
+    return 1 if results['grew'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+"""Minimal stand-in for tkinter so the UI can be benchmarked without a display
+
+Widgets only remember their options and count calls; nothing is drawn. The numbers
+therefore measure the Python side of a refresh (what the app asks Tk to do), not Tk
+itself. Run the benchmarks under a virtual display (xvfb-run) with --real-tk to
+include Tk's own cost.
+
+after() callbacks are queued but only run from update(), which the soak harness calls.
+"""
+import sys
+import time
+import types
+import itertools
+
+END = 'end'
+BOTH, X, Y = 'both', 'x', 'y'
+LEFT, RIGHT, TOP, BOTTOM = 'left', 'right', 'top', 'bottom'
+N, S, E, W, NW, CENTER = 'n', 's', 'e', 'w', 'nw', 'center'
+RAISED, FLAT, SUNKEN, GROOVE, RIDGE = 'raised', 'flat', 'sunken', 'groove', 'ridge'
+NORMAL, DISABLED, HIDDEN = 'normal', 'disabled', 'hidden'
+HORIZONTAL, VERTICAL = 'horizontal', 'vertical'
+
+# Calls that would be Tcl round-trips with a real Tk
+calls = {'config': 0, 'insert': 0, 'delete': 0, 'canvas': 0}
+
+
+# Pending after/after_idle callbacks: identifier -> (due, sequence, callback, args)
+timers = {}
+_sequence = itertools.count(1)
+# update() runs timers this many times faster than wall time: after(1000) is due after 1000 / TIME_SCALE ms
+TIME_SCALE = 1.0
+
+
+class TclError(Exception):
+    pass
+
+
+class Interp:
+    """The Tcl calls the harnesses make through widget.tk"""
+
+    def call(self, *args):
+        if args == ('after', 'info'):
+            return tuple(timers)
+        return ''
+
+    def splitlist(self, value):
+        return tuple(value)
+
+
+class Misc:
+    tk = Interp()
+
+    def __init__(self, master=None, **options):
+        self.master = master
+        self.options = options
+        self.children = []
+        if master is not None:
+            master.children.append(self)
+
+    def config(self, **options):
+        calls['config'] += 1
+        self.options.update(options)
+
+    configure = config
+
+    def cget(self, option):
+        return self.options.get(option, '')
+
+    __getitem__ = cget
+
+    def pack(self, **options):
+        pass
+
+    grid = place = pack_forget = grid_forget = pack
+
+    def bind(self, sequence=None, func=None, add=None):
+        pass
+
+    bind_all = tag_bind = bind
+
+    def after(self, ms, func=None, *args):
+        sequence = next(_sequence)
+        identifier = f'after#{sequence}'
+        timers[identifier] = (time.monotonic() + ms / 1000 / TIME_SCALE, sequence, func, args)
+        return identifier
+
+    def after_idle(self, func, *args):
+        return self.after(0, func, *args)
+
+    def after_cancel(self, identifier):
+        timers.pop(identifier, None)
+
+    def focus_displayof(self):
+        return self
+
+    def update_idletasks(self):
+        pass
+
+    def update(self):
+        """Run the callbacks that have come due, in the order they were due"""
+        now = time.monotonic()
+        for _, _, identifier in sorted((due, sequence, identifier)
+                                       for identifier, (due, sequence, _, _) in timers.items() if due <= now):
+            entry = timers.pop(identifier, None)
+            if entry is not None and entry[2] is not None:
+                entry[2](*entry[3])
+
+    def winfo_width(self):
+        return 1600
+
+    def winfo_height(self):
+        return 1200
+
+    def winfo_ismapped(self):
+        return True
+
+    def winfo_children(self):
+        return list(self.children)
+
+    def destroy(self):
+        pass
+
+
+class Tk(Misc):
+    def __init__(self, *args, **options):
+        super().__init__()
+
+    def title(self, *args):
+        pass
+
+    geometry = resizable = protocol = attributes = title
+
+    def mainloop(self):
+        pass
+
+    def quit(self):
+        pass
+
+
+class Frame(Misc):
+    pass
+
+
+class Label(Misc):
+    pass
+
+
+class Button(Misc):
+    pass
+
+
+class Entry(Misc):
+    def get(self):
+        return self.options.get('text', '')
+
+
+class Scrollbar(Misc):
+    def set(self, *args):
+        pass
+
+
+class Listbox(Misc):
+    def __init__(self, master=None, **options):
+        super().__init__(master, **options)
+        self.items = []
+
+    def insert(self, index, *elements):
+        calls['insert'] += 1
+        if index == END:
+            self.items.extend(elements)
+        else:
+            self.items[index:index] = elements
+
+    def delete(self, first, last=None):
+        calls['delete'] += 1
+        if last is None:
+            del self.items[first]
+        else:
+            del self.items[first:None if last == END else last + 1]
+
+    def get(self, first, last=None):
+        if last is None:
+            return self.items[first]
+        return tuple(self.items[first:None if last == END else last + 1])
+
+    def size(self):
+        return len(self.items)
+
+    def itemconfig(self, index, **options):
+        calls['config'] += 1
+
+    def yview(self, *args):
+        return (0.0, 1.0)
+
+    def see(self, index):
+        pass
+
+
+class Canvas(Misc):
+    def __init__(self, master=None, **options):
+        super().__init__(master, **options)
+        self.next_id = 0
+        self.items = {}  # item id -> options
+
+    def _create(self, *args, **options):
+        calls['canvas'] += 1
+        self.next_id += 1
+        self.items[self.next_id] = options
+        return self.next_id
+
+    create_text = create_rectangle = create_line = create_oval = create_polygon = create_window = _create
+
+    def _find(self, tag_or_id):
+        if tag_or_id in self.items:
+            return [self.items[tag_or_id]]
+        return [options for options in self.items.values() if tag_or_id in options.get('tags', ())]
+
+    def itemconfig(self, item, **options):
+        calls['canvas'] += 1
+        for item_options in self._find(item):
+            item_options.update(options)
+
+    itemconfigure = itemconfig
+
+    def itemcget(self, item, option):
+        return self.items[item].get(option, '')
+
+    def bbox(self, item):
+        # Rough text extent from the point size: about 0.6 em per character
+        options = self.items.get(item, {})
+        font = options.get('font') or ('', 12)
+        width = int(len(str(options.get('text', ''))) * font[1] * 0.8)
+        return (0, 0, width, int(font[1] * 1.6))
+
+    def coords(self, item, *coordinates):
+        calls['canvas'] += 1
+
+    def move(self, item, dx, dy):
+        calls['canvas'] += 1
+
+    def delete(self, *items):
+        calls['canvas'] += 1
+
+    def yview(self, *args):
+        return (0.0, 1.0)
+
+    def yview_moveto(self, fraction):
+        pass
+
+
+def install():
+    """Register the stub as tkinter (and its ttk, messagebox and font submodules)"""
+    module = sys.modules[__name__]
+    for name in ('ttk', 'messagebox', 'font'):
+        submodule = types.ModuleType(f'tkinter.{name}')
+        setattr(module, name, submodule)
+        sys.modules[f'tkinter.{name}'] = submodule
+    sys.modules['tkinter'] = module
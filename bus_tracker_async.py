@@ -0,0 +1,247 @@
+"""asyncio polling for TrackerEngine: one event loop thread runs polls, station lookups and fetches as tasks
+
+Blocking MVG calls run on a small pool of daemon threads. The loop awaits them with deadlines, so a hung
+station falls back to the timetable or fails on its own instead of stalling the whole poll. Snapshots reach
+Tk through the same results queue as DepartureFetchWorker, drained by the UI's result pump. stop() cancels
+the poll loop and every await in flight; TrackerEngine.stop then cuts off the requests themselves.
+"""
+import sys
+import queue
+import asyncio
+import threading
+from concurrent.futures import Executor, Future
+
+from bus_tracker_core import DepartureSnapshot
+
+
+class DaemonThreadPool(Executor):
+    """Executor on daemon threads, for calls the loop may abandon after a timeout or cancel
+
+    ThreadPoolExecutor joins its workers at interpreter exit, so one abandoned request would keep a closed
+    tracker alive until its socket timed out. Threads start on demand and are reused while idle.
+    """
+
+    def __init__(self, max_workers, thread_name_prefix='tracker-blocking'):
+        self.max_workers = max_workers
+        self.thread_name_prefix = thread_name_prefix
+        self._work = queue.SimpleQueue()
+        self._idle = threading.Semaphore(0)
+        self._threads = []
+        self._shutdown = False
+        self._lock = threading.Lock()
+
+    def submit(self, function, *args, **kwargs):
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new calls after shutdown")
+            self._work.put((future, function, args, kwargs))
+            if not self._idle.acquire(blocking=False) and len(self._threads) < self.max_workers:
+                thread = threading.Thread(target=self._worker, name=f'{self.thread_name_prefix}_{len(self._threads)}',
+                                          daemon=True)
+                self._threads.append(thread)
+                thread.start()
+        return future
+
+    def _worker(self):
+        while True:
+            item = self._work.get()
+            if item is None:
+                return
+            future, function, args, kwargs = item
+            # Skipped when the awaiting task was cancelled before a thread got to it
+            if future.set_running_or_notify_cancel():
+                try:
+                    result = function(*args, **kwargs)
+                except BaseException as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+            item = future = None
+            self._idle.release()
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        """Let idle threads finish; busy ones exit once their call returns (wait=False never blocks on them)"""
+        with self._lock:
+            self._shutdown = True
+            threads = list(self._threads)
+        if cancel_futures:
+            while True:
+                try:
+                    item = self._work.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    item[0].cancel()
+        for _ in threads:
+            self._work.put(None)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+
+class AsyncFetchWorker:
+    """Drop-in for DepartureFetchWorker that drives the engine from an asyncio loop on its own thread"""
+
+    def __init__(self, engine, scheduler, fetch_timeout=15, lookup_timeout=10, model_timeout=30, stop_timeout=5):
+        self.engine = engine
+        self.scheduler = scheduler
+        self.metrics = engine.metrics
+        self.fetch_timeout = fetch_timeout  # seconds for one station, every page included
+        self.lookup_timeout = lookup_timeout  # seconds for one station lookup
+        self.model_timeout = model_timeout  # seconds a poll waits for a delay model rebuild
+        self.stop_timeout = stop_timeout  # seconds stop() waits for the loop thread
+        # Twice the station requests, so a poll whose calls were all abandoned still leaves room for the next
+        self.executor = DaemonThreadPool(max(2, 2 * engine.fetch_workers))
+        self._model_build = None
+        self.next_delay = None
+        self.results = queue.Queue()
+        self.loop = None
+        self._main_task = None
+        self._wakeup = None
+        self._polling = False
+        self._started = threading.Event()
+        self._thread = None
+
+    @property
+    def in_flight(self):
+        """True while a poll is running"""
+        return self._polling
+
+    def start(self, initial_delay=0):
+        """Start the event loop thread"""
+        # A daemon thread only as a last resort; stop() cancels the tasks and joins it
+        self._thread = threading.Thread(target=self._run, args=(initial_delay,), name='tracker-loop', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Cancel the poll loop and every fetch it awaits, then wait for the loop thread to finish"""
+        if self._thread is None:
+            return
+        self._started.wait(self.stop_timeout)
+        self._call_soon(self._cancel)
+        if self._thread is not threading.current_thread():
+            self._thread.join(self.stop_timeout)
+        self.executor.shutdown(wait=False)
+
+    def request_fetch(self):
+        """Poll now; a request made while a poll runs is answered by that poll"""
+        if self._polling:
+            self.metrics.inc('polls_skipped')
+        self._call_soon(self._wake)
+
+    def _call_soon(self, callback):
+        loop = self.loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(callback)
+            except RuntimeError:
+                # The loop has already finished
+                pass
+
+    def _wake(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _cancel(self):
+        if self._main_task is not None:
+            self._main_task.cancel()
+
+    def _run(self, initial_delay):
+        self.loop = asyncio.new_event_loop()
+        try:
+            self._main_task = self.loop.create_task(self._main(initial_delay))
+            self._started.set()
+            self.loop.run_until_complete(self._main_task)
+        except asyncio.CancelledError:
+            # Cancelled before the task got to run
+            pass
+        finally:
+            self._started.set()
+            self.loop.close()
+
+    async def _main(self, initial_delay):
+        self._wakeup = asyncio.Event()
+        try:
+            await self.resolve_stations()
+            delay = initial_delay
+            while True:
+                await self.scheduler.clock.wait_async(self._wakeup, delay)
+                self._wakeup.clear()
+                delay = await self.poll()
+        except asyncio.CancelledError:
+            pass
+
+    async def run_blocking(self, function, *args, timeout=None):
+        """Run a blocking engine call on the daemon pool; a timeout or cancel abandons the call"""
+        future = asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+        return await asyncio.wait_for(future, timeout)
+
+    async def resolve_stations(self):
+        """Look up every watched station missing from the cache at once; failed lookups are retried by polls"""
+        engine = self.engine
+        names = sorted(set(entry.station for entry in engine.watch_list) - set(engine.stations))
+        results = await asyncio.gather(*(self.run_blocking(engine.resolve_station, name, timeout=self.lookup_timeout)
+                                         for name in names), return_exceptions=True)
+        for result in results:
+            if isinstance(result, asyncio.TimeoutError):
+                self.metrics.inc('timeouts', ('kind', 'lookup'))
+
+    async def fetch_station(self, station_name, transport_types, entries):
+        """engine.fetch_station with a deadline; a station that misses it falls back to the timetable"""
+        engine = self.engine
+        try:
+            return await self.run_blocking(engine.fetch_station, station_name, transport_types, entries,
+                                           timeout=self.fetch_timeout)
+        except asyncio.TimeoutError:
+            self.metrics.inc('timeouts', ('kind', 'fetch'))
+            departures = engine.scheduled_departures(station_name, transport_types, entries)
+            if not departures:
+                raise TimeoutError(f"TIMEOUT: {station_name}") from None
+            return engine.match_departures(station_name, entries, departures, scheduled=True), 0, 0
+
+    async def refresh_delay_model(self):
+        """engine.refresh_delay_model with a deadline; a slow rebuild carries on for a later poll to pick up"""
+        if self._model_build is None or self._model_build.done():
+            self._model_build = asyncio.get_running_loop().run_in_executor(self.executor,
+                                                                          self.engine.refresh_delay_model)
+        try:
+            await asyncio.wait_for(asyncio.shield(self._model_build), self.model_timeout)
+        except asyncio.TimeoutError:
+            self.metrics.inc('timeouts', ('kind', 'model'))
+
+    async def fetch_snapshot(self):
+        """engine.fetch_snapshot with every station request running as its own task"""
+        engine = self.engine
+        await self.refresh_delay_model()
+        try:
+            with self.metrics.span('poll'):
+                results = await asyncio.gather(*(
+                    self.fetch_station(station_name, transport_types, entries)
+                    for (station_name, transport_types), entries in engine.station_requests().items()
+                ), return_exceptions=True)
+                departures, errors, pages = engine.merge_results(results)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return engine.failed_snapshot(e)
+        return engine.make_snapshot(departures, errors, pages)
+
+    async def poll(self):
+        """Run one poll, queue its snapshot for the UI and return the delay until the next one"""
+        self._polling = True
+        try:
+            snapshot = await self.fetch_snapshot()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.metrics.inc('errors', ('kind', 'monitor'))
+            print(f"Monitoring error: {e}", file=sys.stderr)
+            return self.scheduler.next_delay(DepartureSnapshot((), self.scheduler.clock.time(), str(e)))
+        finally:
+            self._polling = False
+        # Refresh requests made while this poll ran are answered by it
+        self._wakeup.clear()
+        self.next_delay = self.scheduler.next_delay(snapshot)
+        self.results.put(snapshot)
+        return self.next_delay
@@ -0,0 +1,168 @@
+"""Departures board: a diffing Listbox renderer and a virtualized view over thousands of rows"""
+import tkinter as tk
+
+from bus_tracker_canvas import linespace
+
+
+class ListboxRenderer:
+    """Keep a Listbox in sync with keyed rows, touching only rows that changed"""
+
+    def __init__(self, listbox):
+        self.listbox = listbox
+        self.keys = []
+        self.texts = []
+
+    def render(self, rows):
+        """Apply a list of (key, text) rows with the fewest insert/delete calls"""
+        # Identical trips watched twice (e.g. overlapping entries) get distinct keys
+        seen = {}
+        keyed_rows = []
+        for key, text in rows:
+            count = seen.get(key, 0)
+            seen[key] = count + 1
+            keyed_rows.append(((key, count), text))
+        wanted = set(key for key, _ in keyed_rows)
+
+        i = 0
+        for key, text in keyed_rows:
+            # Drop rows that disappeared (departed buses leave from the top)
+            while i < len(self.keys) and self.keys[i] not in wanted:
+                self._delete(i)
+
+            if i < len(self.keys) and self.keys[i] == key:
+                if self.texts[i] != text:
+                    self._delete(i)
+                    self._insert(i, key, text)
+            else:
+                # Row moved further up (re-ranked) or is new
+                if key in self.keys[i:]:
+                    self._delete(self.keys.index(key, i))
+                self._insert(i, key, text)
+            i += 1
+
+        if i < len(self.keys):
+            self.listbox.delete(i, tk.END)
+            del self.keys[i:]
+            del self.texts[i:]
+
+    def _delete(self, index):
+        self.listbox.delete(index)
+        del self.keys[index]
+        del self.texts[index]
+
+    def _insert(self, index, key, text):
+        self.listbox.insert(index, text)
+        self.keys.insert(index, key)
+        self.texts.insert(index, text)
+
+
+class FilterIndex:
+    """Positions of every line and destination in a sorted departure tuple, built once per snapshot"""
+
+    def __init__(self, departures):
+        self.by_line = {}
+        self.by_destination = {}
+        for position, dep in enumerate(departures):
+            self.by_line.setdefault(dep.line.casefold(), []).append(position)
+            self.by_destination.setdefault(dep.destination.casefold(), []).append(position)
+
+    def positions(self, query):
+        """Sorted positions whose line equals query or whose destination contains it"""
+        query = query.strip().casefold()
+        # Distinct lines and destinations number in the hundreds even for a whole hub
+        matches = [positions for destination, positions in self.by_destination.items() if query in destination]
+        if query in self.by_line:
+            matches.append(self.by_line[query])
+        if len(matches) == 1:
+            return matches[0]
+        return sorted(set().union(*matches))
+
+
+class VirtualBoard:
+    """Keep the full sorted departure set but materialize only the visible rows plus an overscan"""
+
+    def __init__(self, listbox, scrollbar, format_row, font, overscan=5):
+        self.listbox = listbox
+        self.scrollbar = scrollbar
+        self.format_row = format_row  # format_row(dep, now) -> (key, text)
+        self.overscan = overscan
+        self.renderer = ListboxRenderer(listbox)
+        self.line_height = max(1, linespace(listbox, font))
+        self.departures = ()
+        self.view = ()  # departures passing the filter, in board order
+        self.query = ''
+        self.offset = 0
+        self.now = 0
+        self._index = None
+
+    def visible_rows(self):
+        """Rows that fit the listbox at its current height"""
+        return max(1, self.listbox.winfo_height() // self.line_height)
+
+    def set_departures(self, departures):
+        """Show a new sorted departure tuple; the filter and scroll position carry over"""
+        if departures is self.departures:
+            return
+        self.departures = departures
+        self._index = None
+        self._apply_filter()
+
+    def set_filter(self, query):
+        """Show only departures of a line or towards a matching destination; '' shows all"""
+        if query.strip() != self.query:
+            self.query = query.strip()
+            self.offset = 0
+            self._apply_filter()
+            self.render(self.now)
+
+    def _apply_filter(self):
+        if not self.query:
+            self.view = self.departures
+            return
+        # Built on first use per snapshot; boards nobody filters never pay for it
+        if self._index is None:
+            self._index = FilterIndex(self.departures)
+        departures = self.departures
+        self.view = [departures[position] for position in self._index.positions(self.query)]
+
+    def scroll(self, rows):
+        """Move the window by rows, clamped to the view"""
+        offset = max(0, min(self.offset + rows, len(self.view) - self.visible_rows()))
+        if offset != self.offset:
+            self.offset = offset
+            self.render(self.now)
+
+    def yview(self, *args):
+        """Scrollbar command: ('moveto', fraction) or ('scroll', n, 'units' | 'pages')"""
+        if args[0] == 'moveto':
+            self.scroll(int(float(args[1]) * len(self.view)) - self.offset)
+        elif args[0] == 'scroll':
+            step = self.visible_rows() if args[2] == 'pages' else 1
+            self.scroll(int(args[1]) * step)
+
+    def on_mousewheel(self, event):
+        """Scroll three rows per wheel notch; 'break' keeps the Listbox from scrolling itself"""
+        if getattr(event, 'num', None) == 4 or getattr(event, 'delta', 0) > 0:
+            self.scroll(-3)
+        else:
+            self.scroll(3)
+        return 'break'
+
+    def render(self, now):
+        """Format and show the rows in the window; cost depends on the window, not the view"""
+        self.now = now
+        view = self.view
+        visible = self.visible_rows()
+        self.offset = max(0, min(self.offset, len(view) - visible))
+        if not view:
+            self.show_message('no_match', f">>> NO TRANSPORTS MATCH '{self.query}' <<<")
+            return
+        window = view[self.offset:self.offset + visible + self.overscan]
+        self.renderer.render([self.format_row(dep, now) for dep in window])
+        total = len(view)
+        self.scrollbar.set(self.offset / total, min(1.0, (self.offset + visible) / total))
+
+    def show_message(self, key, text):
+        """Replace the board with a single message row"""
+        self.renderer.render([(key, text)])
+        self.scrollbar.set(0.0, 1.0)
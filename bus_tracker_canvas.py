@@ -0,0 +1,208 @@
+"""Draw the tracker's top panels on one tk.Canvas instead of nested glow frames and labels
+
+Every panel (glow border, icons, text) is a handful of canvas items. Text changes and the status icon's
+font pulse become item updates; no geometry manager has to re-solve the window.
+"""
+import tkinter as tk
+
+PANEL_GAP = 15
+
+
+def linespace(root, spec):
+    """Line height in pixels of a font spec; estimated from the point size without a font measurer"""
+    try:
+        from tkinter import font
+        return font.Font(root=root, font=spec).metrics('linespace')
+    except (AttributeError, ImportError, tk.TclError):
+        return int(spec[1] * 1.6)
+
+
+class CanvasText:
+    """A text item that accepts Label options (text, fg, font), so set_widget drives it like a widget"""
+
+    OPTIONS = {'text': 'text', 'fg': 'fill', 'font': 'font'}
+
+    def __init__(self, canvas, item, row=None, panel=None):
+        self.canvas = canvas
+        self.item = item
+        self.row = row  # re-centred when the text or font changes width
+        self.panel = panel  # bg goes to the panel's fill, like a label filling its frame
+
+    def config(self, **options):
+        item_options = {self.OPTIONS[name]: value for name, value in options.items() if name in self.OPTIONS}
+        if item_options:
+            self.canvas.itemconfigure(self.item, **item_options)
+        if self.row and ('text' in options or 'font' in options):
+            self.row.align()
+        if self.panel and 'bg' in options:
+            self.panel.config(bg=options['bg'])
+
+    configure = config
+
+
+class CanvasRow:
+    """Items laid out left to right with gaps and centred as a group, like a packed header frame"""
+
+    def __init__(self, canvas, items, gaps):
+        self.canvas = canvas
+        self.items = items
+        self.gaps = gaps  # space after each item but the last
+        self.center = (0, 0)
+
+    def place(self, x, y):
+        self.center = (x, y)
+        self.align()
+
+    def align(self):
+        widths = []
+        for item in self.items:
+            box = self.canvas.bbox(item)
+            widths.append(box[2] - box[0] if box else 0)
+        x = self.center[0] - (sum(widths) + sum(self.gaps)) / 2
+        for index, item in enumerate(self.items):
+            self.canvas.coords(item, x, self.center[1])
+            x += widths[index] + (self.gaps[index] if index < len(self.gaps) else 0)
+
+
+class CanvasPanel:
+    """A bordered panel: glow rectangle, inner fill and lines of text, each line (item or row, height, pad)"""
+
+    def __init__(self, panels, tag, glow, fill, thickness, visible=True):
+        self.panels = panels
+        self.canvas = panels.canvas
+        self.tag = tag
+        self.thickness = thickness
+        self.visible = visible
+        self.lines = []
+        self.glow_rect = self.canvas.create_rectangle(0, 0, 0, 0, fill=glow, outline=glow, tags=(tag,))
+        self.fill_rect = self.canvas.create_rectangle(0, 0, 0, 0, fill=fill, outline=fill, tags=(tag,))
+
+    def add_line(self, line, height, pad_top=0, pad_bottom=0):
+        self.lines.append((line, height, pad_top, pad_bottom))
+
+    def config(self, **options):
+        """bg recolours the whole panel (the LEAVE NOW flash)"""
+        if 'bg' in options:
+            self.canvas.itemconfigure(self.glow_rect, fill=options['bg'], outline=options['bg'])
+            self.canvas.itemconfigure(self.fill_rect, fill=options['bg'], outline=options['bg'])
+
+    configure = config
+
+    def pack(self, **options):
+        """Show the panel; the panels below move down"""
+        self.panels.set_visible(self, True)
+
+    def pack_forget(self):
+        self.panels.set_visible(self, False)
+
+    def layout(self, left, right, top):
+        """Position the panel's items from top; returns the bottom edge"""
+        inset = self.thickness + 1
+        y = top + inset
+        center_x = (left + right) / 2
+        for line, height, pad_top, pad_bottom in self.lines:
+            y += pad_top
+            if isinstance(line, CanvasRow):
+                line.place(center_x, y + height / 2)
+            else:
+                self.canvas.coords(line, center_x, y + height / 2)
+            y += height + pad_bottom
+        bottom = y + inset
+        self.canvas.coords(self.glow_rect, left, top, right, bottom)
+        self.canvas.coords(self.fill_rect, left + inset, top + inset, right - inset, bottom - inset)
+        return bottom
+
+
+class CanvasPanels:
+    """The title, status, target, LEAVE NOW and countdown panels drawn on a single canvas"""
+
+    def __init__(self, app, parent):
+        self.app = app
+        colors, fonts = app.colors, app.fonts
+        self.canvas = tk.Canvas(parent, bg=colors['bg'], highlightthickness=0, bd=0)
+        self.panels = []
+        self.width = 0
+        card = colors['card_bg']
+
+        # Title: cycling icon and title on one row, subtitle below
+        title = self.panel('title', colors['primary'], card, 3)
+        app.bus_icon_label, app.title_label = self.row(title, [
+            (app.safe_icon('cyber', '◈'), ('Helvetica', 80, 'bold'), colors['electric_blue']),
+            ("MUNICH BUS TRACKER", fonts['title'], colors['primary']),
+        ], gaps=[20], pad=(15, 10))
+        app.subtitle_label = self.text(title, ">>> CYBERPUNK TRANSIT INTERFACE <<<", fonts['subtitle'],
+                                       colors['secondary'], pad=(0, 15))
+
+        status = self.panel('status', colors['matrix_green'], card, 2)
+        app.status_icon, app.status_label = self.row(status, [
+            (app.safe_icon('electric', '⚡'), ('Helvetica', 28, 'bold'), colors['matrix_green']),
+            (">>> INITIALIZING NEURAL LINK <<<", fonts['body'], colors['matrix_green']),
+        ], gaps=[10], pad=(12, 12))
+
+        target = self.panel('target', colors['laser_red'], card, 2)
+        self.row(target, [
+            (app.safe_icon('laser', '◆'), ('Helvetica', 35, 'bold'), colors['laser_red']),
+            (">>> TARGET DESTINATION <<<", fonts['subheader'], colors['text']),
+        ], gaps=[10], pad=(12, 5))
+        self.text(target, app.describe_targets(), fonts['header'], colors['laser_red'], pad=(0, 12))
+
+        # Hidden until LEAVE NOW; showing it pushes the countdown down like the packed frame did
+        alert = self.panel('alert', colors['danger'], colors['danger'], 6, visible=False)
+        app.leave_now_frame = alert
+        app.leave_now_label = self.text(alert, "", fonts['alert'], colors['text'], pad=(30, 30), lines=2)
+        app.leave_now_label.panel = alert
+
+        countdown = self.panel('countdown', colors['electric_purple'], card, 3)
+        self.row(countdown, [
+            (app.safe_icon('digital', '▲'), ('Helvetica', 35, 'bold'), colors['electric_purple']),
+            (">>> NEXT DEPARTURE <<<", fonts['subheader'], colors['electric_purple']),
+        ], gaps=[10], pad=(12, 5))
+        app.next_bus_label = self.text(countdown, "", fonts['medium'], colors['text'], pad=(5, 5))
+        app.countdown_label = self.text(countdown, "", fonts['countdown'], colors['primary'], pad=(8, 8))
+        app.leave_time_icon, app.leave_time_label = self.row(countdown, [
+            (app.safe_icon('alert', '⚡'), ('Helvetica', 30, 'bold'), colors['warning']),
+            ("", fonts['large'], colors['warning']),
+        ], gaps=[10], pad=(0, 12))
+
+        self.canvas.bind('<Configure>', self.on_configure, add='+')
+        self.layout(max(1, self.canvas.winfo_width()) if self.canvas.winfo_ismapped() else 1570)
+
+    def panel(self, tag, glow, fill, thickness, visible=True):
+        panel = CanvasPanel(self, tag, glow, fill, thickness, visible)
+        self.panels.append(panel)
+        return panel
+
+    def text(self, panel, text, spec, color, pad=(0, 0), lines=1):
+        item = self.canvas.create_text(0, 0, text=text, font=spec, fill=color, anchor=tk.CENTER,
+                                       justify=tk.CENTER, tags=(panel.tag,))
+        panel.add_line(item, linespace(self.canvas, spec) * lines, *pad)
+        return CanvasText(self.canvas, item)
+
+    def row(self, panel, cells, gaps, pad=(0, 0)):
+        items = [self.canvas.create_text(0, 0, text=text, font=spec, fill=color, anchor=tk.W, tags=(panel.tag,))
+                 for text, spec, color in cells]
+        row = CanvasRow(self.canvas, items, gaps)
+        panel.add_line(row, max(linespace(self.canvas, spec) for _, spec, _ in cells), *pad)
+        return [CanvasText(self.canvas, item, row) for item in items]
+
+    def pack(self, **options):
+        self.canvas.pack(**options)
+
+    def on_configure(self, event):
+        if event.width != self.width:
+            self.layout(event.width)
+
+    def set_visible(self, panel, visible):
+        if panel.visible != visible:
+            panel.visible = visible
+            self.layout(self.width)
+
+    def layout(self, width):
+        """Stack the visible panels; runs on resize and when the alert shows or hides, not per update"""
+        self.width = width
+        y = 0
+        for panel in self.panels:
+            self.canvas.itemconfigure(panel.tag, state=tk.NORMAL if panel.visible else tk.HIDDEN)
+            if panel.visible:
+                y = panel.layout(0, width, y) + PANEL_GAP
+        self.canvas.config(height=max(0, y - PANEL_GAP))
@@ -0,0 +1,1115 @@
+"""Tk-free tracking engine: polling, filtering and leave times shared by the UI and the headless daemon"""
+import os
+import sys
+import json
+import time
+import queue
+import random
+import gzip
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from functools import lru_cache
+from collections import namedtuple, deque, OrderedDict
+from urllib.parse import urlsplit, urlencode
+
+from bus_tracker_history import HistoryStore
+from bus_tracker_metrics import MetricsRegistry
+
+# mvg pulls in aiohttp (~0.4 s); it is imported only for station lookups and API errors
+
+# Same as mvg.mvgapi.Base.FIB and Endpoint.FIB_DEPARTURE
+MVG_API_BASE = 'https://www.mvg.de/api/bgw-pt/v3'
+DEPARTURES_ENDPOINT = '/departures'
+
+# Mirrors mvg.TransportType: name -> (display name, icon)
+TRANSPORT_TYPES = {
+    'BAHN': ('Bahn', 'mdi:train'),
+    'SBAHN': ('S-Bahn', 'mdi:subway-variant'),
+    'UBAHN': ('U-Bahn', 'mdi:subway'),
+    'TRAM': ('Tram', 'mdi:tram'),
+    'BUS': ('Bus', 'mdi:bus'),
+    'REGIONAL_BUS': ('Regionalbus', 'mdi:bus'),
+    'SEV': ('SEV', 'mdi:taxi'),
+    'SCHIFF': ('Schiff', 'mdi:ferry'),
+}
+# TransportType.all() leaves out replacement services
+ALL_TRANSPORT_TYPES = tuple(name for name in TRANSPORT_TYPES if name != 'SEV')
+
+# Default single target when no watch list is given
+DEFAULT_STATION = 'Parkring Süd'
+DEFAULT_DESTINATION = 'Garching, Forschungszentrum (U)'
+DEFAULT_WALK_TIME_MINUTES = 5
+# One fetch worker and kept-alive connection per distinct station request, so a poll costs one round trip.
+# Past this many requests a poll takes a few round trips instead of opening ever more connections to MVG.
+MAX_FETCH_WORKERS = 32
+
+# Snapshot error while every shown departure comes from the offline timetable
+TIMETABLE_ERROR = 'MVG UNREACHABLE - SHOWING TIMETABLE'
+
+
+def api_error(message):
+    """An mvg.MvgApiError, so callers see the same exception type as with MvgApi"""
+    from mvg import MvgApiError
+    return MvgApiError(message)
+
+
+def parse_departures(result):
+    """Departure dicts shaped like MvgApi.departures results from raw departures JSON"""
+    if not isinstance(result, list):
+        raise api_error(f"Bad API call: Expected a list, but got {type(result)}.")
+    try:
+        return [
+            {
+                'time': int(departure['realtimeDepartureTime'] / 1000),
+                'planned': int(departure['plannedDepartureTime'] / 1000),
+                'line': departure['label'],
+                'destination': departure['destination'],
+                'type': TRANSPORT_TYPES[departure['transportType']][0],
+                'icon': TRANSPORT_TYPES[departure['transportType']][1],
+                'cancelled': departure['cancelled'],
+                'messages': departure['messages'],
+            }
+            for departure in result
+        ]
+    except (AssertionError, KeyError) as e:
+        raise api_error("Bad MVG API call: Invalid departure data.") from e
+
+
+class SystemClock:
+    """Wall-clock time; replays swap in a virtual clock (see bus_tracker_sources.py)"""
+    
+    speed = 1.0
+    
+    def time(self):
+        """Current epoch seconds"""
+        return time.time()
+        
+    def sleep(self, seconds):
+        """Block for seconds of clock time"""
+        time.sleep(seconds)
+        
+    def wait(self, event, seconds):
+        """Wait on a threading.Event for up to seconds of clock time; True if it was set"""
+        return event.wait(seconds)
+        
+    async def wait_async(self, event, seconds):
+        """Await an asyncio.Event for up to seconds of clock time; True if it was set"""
+        import asyncio
+        try:
+            await asyncio.wait_for(event.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+        return event.is_set()
+
+
+SYSTEM_CLOCK = SystemClock()
+
+
+# Immutable result handed from the fetch worker to the Tk main thread; pages is (fetched, reused)
+DepartureSnapshot = namedtuple('DepartureSnapshot', ['departures', 'fetched_at', 'error', 'pages'],
+                               defaults=((0, 0),))
+
+
+# One watched (station, destinations) pair; an empty destination set matches every destination
+WatchEntry = namedtuple('WatchEntry', ['station', 'destinations', 'walk_time_minutes', 'transport_types'])
+
+
+def make_watch_entry(station, destinations=(), walk_time_minutes=DEFAULT_WALK_TIME_MINUTES,
+                     transport_types=('REGIONAL_BUS',)):
+    """Build a WatchEntry from plain config values (transport types by TransportType name)"""
+    for name in transport_types:
+        if name not in TRANSPORT_TYPES:
+            raise KeyError(name)
+    return WatchEntry(station, frozenset(destinations), walk_time_minutes, tuple(sorted(transport_types)))
+
+
+def default_watch_list():
+    """The single default target"""
+    return [make_watch_entry(DEFAULT_STATION, [DEFAULT_DESTINATION], DEFAULT_WALK_TIME_MINUTES)]
+
+
+def fetch_worker_count(watch_list):
+    """Fetch workers (and pooled connections) for a watch list: one per (station, transport types) request"""
+    return min(MAX_FETCH_WORKERS, len(set((entry.station, entry.transport_types) for entry in watch_list)))
+
+
+def load_watch_list(path):
+    """Load a JSON list of watch entries: station, destinations, walk_time_minutes, transport_types"""
+    with open(path, encoding='utf-8') as f:
+        entries = json.load(f)
+    return [make_watch_entry(**entry) for entry in entries]
+
+
+# Snapshot fields of a departure, in JSON order
+DEPARTURE_FIELDS = ('time', 'planned', 'line', 'destination', 'type', 'icon', 'cancelled', 'messages', 'station',
+                    'walk_time_minutes', 'leave_time', 'leave_predicted', 'leave_confidence', 'scheduled')
+
+
+class Departure(namedtuple('Departure', DEPARTURE_FIELDS + ('clock', 'leave_clock', 'key'))):
+    """Immutable departure built once per fetch: epoch seconds, precomputed HH:MM strings and trip key
+    
+    It also reads like the MVG dicts it replaces (dep['time'], dep.get('scheduled')).
+    """
+    
+    __slots__ = ()
+    
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            if key not in self._fields:
+                raise KeyError(key)
+            return getattr(self, key)
+        return tuple.__getitem__(self, key)
+        
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self._fields else default
+        
+    def as_dict(self):
+        """JSON-ready dict of the snapshot fields"""
+        return {name: getattr(self, name) for name in DEPARTURE_FIELDS}
+        
+    @classmethod
+    def from_dict(cls, dep):
+        """Departure from a snapshot dict (e.g. received from a feed)"""
+        return make_departure(dep, dep.get('station'), dep.get('walk_time_minutes', 0), dep.get('leave_time'),
+                              dep.get('leave_predicted', False), dep.get('leave_confidence'), dep.get('scheduled', False))
+
+
+_new_tuple = tuple.__new__
+
+
+def clock_string(timestamp):
+    """Local HH:MM for epoch seconds"""
+    return _minute_clock(int(timestamp) // 60)
+
+
+@lru_cache(maxsize=16384)
+def _minute_clock(minute):
+    # Departures share few distinct minutes (1440 a day); formatting each once keeps snapshot builds cheap
+    return time.strftime('%H:%M', time.localtime(minute * 60))
+
+
+def make_departure(dep, station=None, walk_time_minutes=0, leave_time=None, leave_predicted=False,
+                   leave_confidence=None, scheduled=False):
+    """Departure from an MVG-shaped dict plus the watch entry's station, walk time and leave time"""
+    departure_time = dep['time']
+    planned = dep['planned']
+    # Predicted leave times may come back as NumPy scalars
+    leave_time = departure_time - walk_time_minutes * 60 if leave_time is None else int(leave_time)
+    # Names repeat across rows, stations and polls; interning keeps one copy of each
+    line = sys.intern(dep['line'])
+    destination = sys.intern(dep['destination'])
+    if station is not None:
+        station = sys.intern(station)
+    # tuple.__new__ skips the namedtuple constructor's argument handling; this runs once per row per fetch
+    return _new_tuple(Departure, (
+        departure_time, planned, line, destination, dep['type'], dep['icon'], dep['cancelled'],
+        tuple(dep['messages']), station, walk_time_minutes, leave_time, leave_predicted, leave_confidence,
+        scheduled, _minute_clock(departure_time // 60), _minute_clock(leave_time // 60),
+        (station, line, planned, destination)))
+
+
+def freeze_departures(departures):
+    """Departures for a snapshot; dicts are converted, Departure records are shared as they are"""
+    return tuple(dep if isinstance(dep, Departure) else Departure.from_dict(dep) for dep in departures)
+
+
+def snapshot_to_dict(snapshot):
+    """JSON-ready form of a snapshot"""
+    return {
+        'fetched_at': snapshot.fetched_at,
+        'error': snapshot.error,
+        'pages': {'fetched': snapshot.pages[0], 'reused': snapshot.pages[1]},
+        'departures': [dep.as_dict() for dep in snapshot.departures],
+    }
+
+
+def snapshot_from_dict(data):
+    """Rebuild a snapshot from snapshot_to_dict output"""
+    pages = data.get('pages') or {}
+    return DepartureSnapshot(freeze_departures(data['departures']), data['fetched_at'], data.get('error'),
+                             (pages.get('fetched', 0), pages.get('reused', 0)))
+
+
+def default_cache_dir():
+    """Per-user cache directory for the tracker"""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'munich-bus-tracker')
+
+
+def write_json_atomic(path, data):
+    """Write JSON via a temp file and rename so readers never see a partial file"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class StationCache:
+    """On-disk cache of resolved MVG stations (id, name) with a TTL"""
+    
+    def __init__(self, path=None, ttl=30 * 24 * 3600):
+        self.path = path or os.path.join(default_cache_dir(), 'stations.json')
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+        
+    def get(self, query):
+        """Return the cached station for a query, or None if missing or expired"""
+        entry = self._load().get(query)
+        if not entry or time.time() - entry.get('resolved_at', 0) > self.ttl:
+            return None
+        return {'id': entry['id'], 'name': entry['name']}
+        
+    def put(self, query, station):
+        """Remember a resolved station; cache write failures are not fatal"""
+        with self._lock:
+            data = self._load()
+            data[query] = {'id': station['id'], 'name': station['name'], 'resolved_at': time.time()}
+            try:
+                write_json_atomic(self.path, data)
+            except OSError as e:
+                print(f"Station cache error: {e}", file=sys.stderr)
+
+
+class SnapshotStore:
+    """The last good snapshot on disk, so a restart shows departures before its first fetch returns"""
+    
+    def __init__(self, watch_list, path=None):
+        self.path = path or os.path.join(default_cache_dir(), 'last_snapshot.json')
+        # Leave times depend on the whole watch list; a snapshot saved for another one is never shown
+        entries = sorted([entry.station, sorted(entry.destinations), entry.walk_time_minutes,
+                          list(entry.transport_types)] for entry in watch_list)
+        self.watch_key = hashlib.sha1(json.dumps(entries, ensure_ascii=False).encode('utf-8')).hexdigest()
+        
+    def save(self, snapshot):
+        """Replace the saved snapshot; write failures are not fatal"""
+        try:
+            write_json_atomic(self.path, dict(snapshot_to_dict(snapshot), watch=self.watch_key))
+        except OSError as e:
+            print(f"Snapshot cache error: {e}", file=sys.stderr)
+            
+    def load(self):
+        """The saved snapshot for this watch list, or None"""
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('watch') != self.watch_key:
+                return None
+            return snapshot_from_dict(data)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return None
+
+
+
+class PollScheduler:
+    """Pick the next fetch time from the latest snapshot and back off on errors"""
+    
+    def __init__(self, baseline_interval=10, min_interval=5, max_interval=120,
+                 dense_window=180, backoff_base=5, backoff_max=300, clock=None):
+        self.clock = clock or SYSTEM_CLOCK
+        self.baseline_interval = baseline_interval  # the old fixed cadence, used for the savings counter
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.dense_window = dense_window  # poll at min_interval this close to a leave time
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.consecutive_errors = 0
+        self.polls = 0
+        self.errors = 0
+        self.started_at = self.clock.time()
+        
+    def next_delay(self, snapshot, now=None):
+        """Seconds to wait before the next fetch after this snapshot"""
+        now = self.clock.time() if now is None else now
+        self.polls += 1
+        
+        if snapshot.error and all(dep.scheduled for dep in snapshot.departures):
+            # Nothing live came back (at most the timetable stood in): exponential backoff with equal jitter so kiosks don't retry in lockstep
+            self.errors += 1
+            self.consecutive_errors += 1
+            cap = min(self.backoff_max, self.backoff_base * 2 ** (self.consecutive_errors - 1))
+            return cap / 2 + random.uniform(0, cap / 2)
+        self.consecutive_errors = 0
+        
+        upcoming = [dep.leave_time - now for dep in snapshot.departures if dep.time > now]
+        if not upcoming:
+            return self.max_interval
+        
+        time_to_leave = min(upcoming)
+        if time_to_leave <= self.dense_window:
+            return self.min_interval
+        # Sparse while the decision is far off, but wake up in time for the dense window
+        delay = min(time_to_leave - self.dense_window, time_to_leave / 4)
+        return max(self.min_interval, min(self.max_interval, delay))
+        
+    def stats(self):
+        """Poll counters compared with fixed-interval polling over the same period"""
+        elapsed = self.clock.time() - self.started_at
+        fixed_polls = int(elapsed / self.baseline_interval) + 1
+        return {
+            'polls': self.polls,
+            'errors': self.errors,
+            'fixed_interval_polls': fixed_polls,
+            'requests_saved': max(0, fixed_polls - self.polls),
+        }
+
+
+class DepartureFetchWorker:
+    """Background thread that runs MVG fetches off the Tk event loop"""
+    
+    def __init__(self, fetch, scheduler, metrics=None):
+        self.fetch = fetch
+        self.scheduler = scheduler
+        self.metrics = metrics or MetricsRegistry()
+        self.next_delay = None
+        self.results = queue.Queue()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._in_flight = threading.Lock()
+        self._thread = None
+        
+    @property
+    def in_flight(self):
+        """True while a fetch is running"""
+        return self._in_flight.locked()
+        
+    def start(self, initial_delay=0):
+        """Start the worker thread"""
+        self._thread = threading.Thread(target=self._run, args=(initial_delay,), daemon=True)
+        self._thread.start()
+        
+    def stop(self):
+        """Ask the worker thread to finish after the current fetch"""
+        self._stopped.set()
+        self._wakeup.set()
+        
+    def request_fetch(self):
+        """Wake the worker for an immediate fetch, coalesced with any fetch in flight"""
+        self._wakeup.set()
+        
+    def fetch_once(self):
+        """Run one fetch and queue its snapshot; skipped if another fetch is in flight"""
+        if not self._in_flight.acquire(blocking=False):
+            self.metrics.inc('polls_skipped')
+            return False
+        try:
+            snapshot = self.fetch()
+            # Refresh requests made while this fetch ran are answered by it
+            self._wakeup.clear()
+        finally:
+            self._in_flight.release()
+        self.next_delay = self.scheduler.next_delay(snapshot)
+        self.results.put(snapshot)
+        return True
+        
+    def _run(self, initial_delay):
+        delay = initial_delay
+        while not self._stopped.is_set():
+            self.scheduler.clock.wait(self._wakeup, delay)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                self.fetch_once()
+                delay = self.next_delay
+            except Exception as e:
+                self.metrics.inc('errors', ('kind', 'monitor'))
+                print(f"Monitoring error: {e}", file=sys.stderr)
+                delay = self.scheduler.next_delay(DepartureSnapshot((), self.scheduler.clock.time(), str(e)))
+
+
+# Per-request HTTP timing: connect_ms is 0 when a kept-alive connection was reused
+RequestTiming = namedtuple('RequestTiming', ['path', 'status', 'connect_ms', 'transfer_ms', 'bytes', 'reused', 'unchanged'])
+
+
+class DeparturesClient:
+    """Departures over pooled keep-alive HTTP connections with conditional requests"""
+    
+    def __init__(self, base_url=MVG_API_BASE, timeout=10, pool_size=8, history=200):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.host = parts.netloc
+        self.base_path = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._pool = queue.LifoQueue()
+        self._in_use = set()  # connections checked out by a request, so close() can interrupt them
+        self.closed = False  # after close(), requests fail at once instead of opening new connections
+        self._validators = {}  # path -> (etag, last_modified, body digest, parsed result)
+        self._lock = threading.Lock()
+        self.timings = deque(maxlen=history)
+        
+    def _new_connection(self):
+        # http.client drags in the email package (~20 ms); only the first connection pays for it
+        import http.client
+        connection_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        # Honour proxy settings from the environment like the mvg library does (urllib.request is slow to import)
+        from urllib.request import getproxies, proxy_bypass
+        proxy = getproxies().get(self.scheme)
+        if proxy and not proxy_bypass(self.host.split(':')[0]):
+            proxy_parts = urlsplit(proxy)
+            connection = connection_class(proxy_parts.hostname, proxy_parts.port or 8080, timeout=self.timeout)
+            connection.set_tunnel(self.host)
+            return connection
+        return connection_class(self.host, timeout=self.timeout)
+        
+    def _acquire(self):
+        try:
+            connection = self._pool.get_nowait()
+        except queue.Empty:
+            connection = self._new_connection()
+        with self._lock:
+            if self.closed:
+                connection.close()
+                raise ConnectionAbortedError("departures client is closed")
+            self._in_use.add(connection)
+        return connection
+        
+    def _release(self, connection):
+        with self._lock:
+            self._in_use.discard(connection)
+            closed = self.closed
+        if not closed and self._pool.qsize() < self.pool_size:
+            self._pool.put(connection)
+        else:
+            connection.close()
+            
+    def _discard(self, connection):
+        with self._lock:
+            self._in_use.discard(connection)
+        connection.close()
+            
+    def close(self):
+        """Close every pooled connection and cut off requests still waiting for a response"""
+        import socket
+        with self._lock:
+            self.closed = True
+            in_use, self._in_use = self._in_use, set()
+        for connection in in_use:
+            # Closing the descriptor does not wake a thread blocked in recv; shutting the socket down does
+            if connection.sock is not None:
+                try:
+                    connection.sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+    
+    def get_json(self, endpoint, params):
+        """GET an API endpoint as JSON, reusing connections and skipping unchanged bodies"""
+        import http.client
+        path = f"{self.base_path}{endpoint}?{urlencode(params)}"
+        with self._lock:
+            validator = self._validators.get(path)
+        
+        headers = {'Accept': 'application/json', 'Accept-Encoding': 'gzip', 'Connection': 'keep-alive'}
+        if validator and validator[0]:
+            headers['If-None-Match'] = validator[0]
+        if validator and validator[1]:
+            headers['If-Modified-Since'] = validator[1]
+        
+        connection = self._acquire()
+        reused = connection.sock is not None
+        try:
+            try:
+                status, response_headers, body, connect_ms, transfer_ms = self._request(connection, path, headers)
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                if not reused:
+                    raise
+                # The server closed an idle keep-alive connection; retry once on a fresh one
+                connection.close()
+                reused = False
+                status, response_headers, body, connect_ms, transfer_ms = self._request(connection, path, headers)
+        except Exception:
+            self._discard(connection)
+            raise
+        self._release(connection)
+        
+        if status == 304 and validator:
+            self.timings.append(RequestTiming(path, status, connect_ms, transfer_ms, 0, reused, True))
+            return validator[3]
+        if status != 200:
+            raise api_error(f"Bad API call: Got response ({status}) from {path}.")
+        
+        if response_headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        digest = hashlib.sha1(body).digest()
+        unchanged = bool(validator) and validator[2] == digest
+        result = validator[3] if unchanged else json.loads(body)
+        
+        with self._lock:
+            self._validators[path] = (response_headers.get('ETag'), response_headers.get('Last-Modified'), digest, result)
+        self.timings.append(RequestTiming(path, status, connect_ms, transfer_ms, len(body), reused, unchanged))
+        return result
+    
+    def _request(self, connection, path, headers):
+        connect_ms = 0.0
+        if connection.sock is None:
+            started = time.perf_counter()
+            connection.connect()
+            connect_ms = (time.perf_counter() - started) * 1000
+            if self.closed:
+                # close() ran while connecting, before there was a socket to shut down
+                raise ConnectionAbortedError("departures client is closed")
+        
+        started = time.perf_counter()
+        connection.request('GET', path, headers=headers)
+        response = connection.getresponse()
+        body = response.read()
+        transfer_ms = (time.perf_counter() - started) * 1000
+        if response.will_close:
+            connection.close()
+        return response.status, response.headers, body, connect_ms, transfer_ms
+    
+    def raw_departures(self, station_id, limit=10, offset=0, transport_types=None):
+        """Departures JSON for a station (transport types by name) as the API returned it"""
+        if transport_types is None:
+            transport_types = ALL_TRANSPORT_TYPES
+        # Parsed results may be shared between calls, so they are never mutated here
+        return self.get_json(DEPARTURES_ENDPOINT, {
+            'globalId': station_id,
+            'limit': limit,
+            'offsetInMinutes': offset,
+            'transportTypes': ','.join(transport_types),
+        })
+    
+    def departures(self, station_id, limit=10, offset=0, transport_types=None):
+        """Departures for a station (transport types by name), shaped like MvgApi.departures results"""
+        return parse_departures(self.raw_departures(station_id, limit, offset, transport_types))
+    
+    def latency_summary(self):
+        """Median connect and transfer time (ms) and connection reuse rate over recent requests"""
+        timings = list(self.timings)
+        if not timings:
+            return None
+        connects = sorted(t.connect_ms for t in timings if not t.reused)
+        transfers = sorted(t.transfer_ms for t in timings)
+        return {
+            'requests': len(timings),
+            'connect_ms': connects[len(connects) // 2] if connects else 0.0,
+            'transfer_ms': transfers[len(transfers) // 2],
+            'reuse_rate': sum(t.reused for t in timings) / len(timings),
+            'unchanged_rate': sum(t.unchanged for t in timings) / len(timings),
+        }
+
+
+class DepartureSource:
+    """Where departures come from: station lookups and raw departures JSON, parsed the same way for all"""
+    
+    client = None  # DeparturesClient, for latency readouts, when the source talks HTTP
+    live = False  # only live sources may fill the on-disk station cache
+    
+    def station(self, query):
+        """Station dict (id, name, ...) for a search string, or None"""
+        raise NotImplementedError
+        
+    def cached_station(self, query, station):
+        """A station resolved from the on-disk cache instead of station(); recorders still need to see it"""
+        
+    def raw_departures(self, station_id, limit=10, offset=0, transport_types=None):
+        """Departures JSON in the MVG API format"""
+        raise NotImplementedError
+        
+    def departures(self, station_id, limit=10, offset=0, transport_types=None):
+        """Parsed departures, shaped like MvgApi.departures results"""
+        return parse_departures(self.raw_departures(station_id, limit, offset, transport_types))
+        
+    def close(self):
+        """Release connections or files"""
+
+
+class MvgSource(DepartureSource):
+    """The live MVG API: station lookups via MvgApi, departures over the pooled client"""
+    
+    live = True
+    
+    def __init__(self, client=None):
+        self.client = client or DeparturesClient()
+        
+    def station(self, query):
+        # MvgApi.station would wait out aiohttp's five-minute default; give lookups the client's timeout
+        import asyncio
+        from mvg import MvgApi
+        if self.client.closed:
+            raise ConnectionAbortedError("departures client is closed")
+        return asyncio.run(asyncio.wait_for(MvgApi.station_async(query), self.client.timeout))
+        
+    def raw_departures(self, station_id, limit=10, offset=0, transport_types=None):
+        return self.client.raw_departures(station_id, limit, offset, transport_types)
+        
+    def close(self):
+        self.client.close()
+
+
+class DepartureCache:
+    """Short-TTL LRU cache for departure queries that coalesces identical in-flight calls"""
+    
+    def __init__(self, fetch, ttl=5, max_entries=128, clock=None):
+        self.fetch = fetch  # fetch(station_id, limit, offset, transport_types)
+        self.clock = clock or SYSTEM_CLOCK
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (fetched_at, departures)
+        self._in_flight = {}  # key -> Future shared by every caller waiting on the same query
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        
+    def departures(self, station_id, limit=10, offset=0, transport_types=None):
+        """Cached departures; the returned list is shared and must not be mutated"""
+        types_key = tuple(sorted(transport_types or ALL_TRANSPORT_TYPES))
+        key = (station_id, limit, offset, types_key)
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and self.clock.time() - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        
+        if not owner:
+            return future.result()
+        
+        try:
+            result = self.fetch(station_id, limit, offset, transport_types)
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+        
+        with self._lock:
+            self._entries[key] = (self.clock.time(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            del self._in_flight[key]
+        future.set_result(result)
+        return result
+    
+    def clear(self):
+        """Forget every cached result, so the next call of each query goes to the source"""
+        with self._lock:
+            self._entries.clear()
+        
+    def stats(self):
+        """Hit, miss and coalesced-call counters"""
+        return {'hits': self.hits, 'misses': self.misses, 'coalesced': self.coalesced,
+                'entries': len(self._entries)}
+
+
+# One fetched page of a station's departures covering [start, end] in epoch seconds
+DeparturePage = namedtuple('DeparturePage', ['start', 'end', 'departures', 'fetched_at'])
+
+
+class DeparturePager:
+    """Walk offsetInMinutes pages until enough departures match, reusing tail pages between polls"""
+    
+    def __init__(self, fetch, page_size=10, horizon_minutes=120, max_pages=8, tail_ttl=120, clock=None):
+        self.fetch = fetch  # fetch(station_id, limit, offset, transport_types)
+        self.clock = clock or SYSTEM_CLOCK
+        self.page_size = page_size
+        self.horizon_minutes = horizon_minutes
+        self.max_pages = max_pages
+        self.tail_ttl = tail_ttl  # later pages change slowly; only the head is re-fetched every poll
+        self._pages = {}  # (station_id, transport type names) -> [DeparturePage]
+        self._lock = threading.Lock()
+        
+    def _cached_page(self, key, start, now):
+        with self._lock:
+            pages = self._pages.get(key, ())
+        for page in pages:
+            if page.start <= start < page.end and now - page.fetched_at < self.tail_ttl:
+                return page
+        return None
+        
+    def collect(self, station_id, transport_types, satisfied):
+        """Departures from now until satisfied(departures) or the horizon; returns (departures, fetched, reused)"""
+        key = (station_id, tuple(sorted(transport_types)))
+        now = self.clock.time()
+        horizon = now + self.horizon_minutes * 60
+        departures = {}
+        pages = []
+        fetched = reused = 0
+        start = now
+        
+        while True:
+            page = self._cached_page(key, start, now) if pages else None
+            if page:
+                reused += 1
+            else:
+                offset = int((start - now) // 60)
+                result = self.fetch(station_id, self.page_size, offset, transport_types)
+                fetched += 1
+                end = max([dep['time'] for dep in result] + [start])
+                page = DeparturePage(now + offset * 60, end, result, now)
+                # A short page means the API has nothing further ahead
+                if len(result) < self.page_size:
+                    page = page._replace(end=horizon)
+            pages.append(page)
+            
+            for dep in page.departures:
+                departures.setdefault((dep['line'], dep['planned'], dep['destination']), dep)
+            
+            ordered = sorted(departures.values(), key=lambda dep: dep['time'])
+            if satisfied(ordered) or page.end >= horizon or len(pages) >= self.max_pages:
+                break
+            # Continue from the last departure seen; duplicates at the seam are dropped above
+            start = max(page.end, start + 60)
+        
+        with self._lock:
+            self._pages[key] = pages
+        return ordered, fetched, reused
+
+
+def trip_key(dep):
+    """Stable identity of a trip across fetches: station, line, planned time and destination"""
+    if isinstance(dep, Departure):
+        return dep.key
+    return (dep.get('station'), dep['line'], dep['planned'], dep['destination'])
+
+
+def leave_status(dep, now):
+    """(state, minutes until departure, minutes until leaving) for a Departure; state is departed, leave_now, prepare, wait or standby"""
+    until_departure = dep.time - now
+    until_leave = dep.leave_time - now
+    minutes_until_departure = max(0, int(until_departure / 60))
+    minutes_until_leave = max(0, int(until_leave / 60))
+    if until_departure <= 0:
+        state = 'departed'
+    elif until_leave <= 0:
+        state = 'leave_now'
+    elif minutes_until_leave <= 2:
+        state = 'prepare'
+    elif minutes_until_leave <= 5:
+        state = 'wait'
+    else:
+        state = 'standby'
+    return state, minutes_until_departure, minutes_until_leave
+
+
+class TrackerEngine:
+    """Resolve stations, poll the watch list and rank departures by leave time, without any UI"""
+    
+    def __init__(self, watch_list=None, history=True, predict_confidence=None, update_interval=10,
+                 source=None, clock=None, metrics=None, timetable=None, concurrency='asyncio'):
+        self.update_interval = update_interval  # seconds - baseline cadence; actual polls adapt to the next leave time
+        # Live MVG by default; recordings, replays and fakes plug in here (see bus_tracker_sources.py)
+        self.clock = clock or SYSTEM_CLOCK
+        
+        # Watch list of (station, destinations, walk time, transport types)
+        self.watch_list = watch_list or default_watch_list()
+        self.departures_per_station = 10  # page size of each departures request
+        self.wanted_departures = 5  # keep paging until every watch entry has this many matches
+        self.fetch_workers = fetch_worker_count(self.watch_list)
+        self.multi_station = len(set(entry.station for entry in self.watch_list)) > 1
+        # Rows must name the destination unless the watch list pins exactly one
+        self.multi_destination = (any(len(entry.destinations) != 1 for entry in self.watch_list)
+                                  or len(set().union(*(entry.destinations for entry in self.watch_list))) > 1)
+        # One keep-alive connection pool shared by every poll and station
+        self.source = source or MvgSource(DeparturesClient(pool_size=self.fetch_workers))
+        self.departures_client = self.source.client
+        # Timing spans and counters for the /metrics endpoint and the UI debug overlay
+        self.metrics = metrics or MetricsRegistry()
+        self.metrics.add_collector(self.collect_metrics)
+        # Stations are resolved lazily on the fetch threads; fakes and replays keep their ids out of the disk cache
+        self.station_cache = StationCache() if self.source.live else None
+        self.stations = {}
+        # The last good live snapshot, shown at the next start while the first fetch runs
+        self.snapshot_store = SnapshotStore(self.watch_list) if self.source.live else None
+        # Manual refreshes, periodic polls and overlapping entries share identical queries
+        self.departure_cache = DepartureCache(self.metrics.timed('departures_request', self.source.departures),
+                                              clock=self.clock)
+        # Scheduled departures (bus_tracker_timetable.py) stand in for stations MVG cannot answer
+        self.timetable = timetable
+        # Every fetched live departure is kept in a compact on-disk history; virtual-time fakes and replays
+        # would break its observation order and train the delay model on made-up delays
+        self.history = None
+        if history and self.source.live:
+            try:
+                self.history = HistoryStore(clock=self.clock)
+            except OSError as e:
+                # Typically the UI and the daemon running at once; the first one keeps recording
+                print(f"History disabled: {e}", file=sys.stderr)
+        
+        # Optional history-based leave times: "leave at 08:12 to catch it with 95% probability"
+        self.predict_confidence = predict_confidence
+        self.delay_model = None
+        self.model_refresh_seconds = 3600
+        
+        # Busy stations can bury the target destination beyond the first page
+        self.departure_pager = DeparturePager(self.departure_cache.departures, page_size=self.departures_per_station,
+                                              clock=self.clock)
+        self.fetch_pool = ThreadPoolExecutor(
+            max_workers=self.fetch_workers,
+            thread_name_prefix='mvg-fetch')
+        
+        # 'asyncio': polls, station lookups and fetches are tasks with timeouts (bus_tracker_async.py);
+        # 'threads': the plain DepartureFetchWorker thread
+        self.concurrency = concurrency
+        self.poll_scheduler = None
+        self.fetch_worker = None
+        
+    def load_cached_stations(self):
+        """Load stations from the local cache; True if every watched station is known"""
+        if self.station_cache is None:
+            return False
+        for entry in self.watch_list:
+            station = self.station_cache.get(entry.station)
+            if station:
+                self.stations[entry.station] = station
+                self.source.cached_station(entry.station, station)
+        return len(self.stations) == len(set(e.station for e in self.watch_list))
+        
+    def resolve_station(self, name):
+        """Look up a station via MVG and cache it (runs on a fetch thread)"""
+        station = self.stations.get(name)
+        if station:
+            return station
+        
+        with self.metrics.span('station_lookup'):
+            station = self.source.station(name)
+        if not station:
+            raise LookupError(f"STATION NOT FOUND: {name}")
+        if self.station_cache is not None:
+            self.station_cache.put(name, station)
+        station = {'id': station['id'], 'name': station['name']}
+        self.stations[name] = station
+        return station
+        
+    def entry_matches(self, entry, dep):
+        """True if a departure goes to one of the entry's destinations"""
+        return not entry.destinations or dep['destination'] in entry.destinations
+        
+    def fetch_station(self, station_name, transport_types, entries):
+        """Fetch one station once and filter it for every watch entry sharing that request"""
+        def satisfied(departures):
+            return all(
+                sum(1 for dep in departures if self.entry_matches(entry, dep)) >= self.wanted_departures
+                for entry in entries
+            )
+        
+        scheduled = False
+        try:
+            station = self.resolve_station(station_name)
+            # Fetch by station id over the cached, pooled client; MvgApi(station_id) would repeat the station lookup
+            departures, fetched, reused = self.departure_pager.collect(station['id'], transport_types, satisfied)
+        except Exception:
+            departures = self.scheduled_departures(station_name, transport_types, entries)
+            if not departures:
+                raise
+            scheduled = True
+            fetched = reused = 0
+        history = self.history
+        if history and not scheduled:
+            try:
+                history.record(station_name, departures)
+            except (OSError, OverflowError, ValueError) as e:
+                # A full disk, a full string table or a clock stepping back must not fail the fetch itself
+                if self.history is history:
+                    self.history = None
+                    print(f"History disabled: {e}", file=sys.stderr)
+        return self.match_departures(station_name, entries, departures, scheduled), fetched, reused
+        
+    def match_departures(self, station_name, entries, departures, scheduled=False):
+        """Departure records for every watch entry a fetched departure matches"""
+        matches = []
+        with self.metrics.span('filter'):
+            for entry in entries:
+                for dep in departures:
+                    if self.entry_matches(entry, dep):
+                        leave_time, predicted = self.leave_time_for(dep, entry.walk_time_minutes)
+                        matches.append(make_departure(dep, station_name, entry.walk_time_minutes, leave_time,
+                                                      predicted, self.predict_confidence if predicted else None,
+                                                      scheduled))
+        return matches
+        
+    def scheduled_departures(self, station_name, transport_types, entries):
+        """Departures from the offline timetable, or [] when there is none for this station"""
+        if self.timetable is None or not self.timetable.covers(station_name):
+            return []
+        self.metrics.inc('timetable_fallbacks')
+        departures = self.timetable.departures(station_name, self.clock.time(), transport_types=transport_types,
+                                               limit=max(self.departures_per_station,
+                                                         self.wanted_departures * len(entries)))
+        return [dep for dep in departures if any(self.entry_matches(entry, dep) for entry in entries)]
+        
+    def leave_time_for(self, dep, walk_time_minutes):
+        """Leave time (epoch s) from the delay model when predicting, else departure minus walk time"""
+        model = self.delay_model
+        if model is not None:
+            leave_time = model.suggest_leave_time(dep['line'], dep['planned'], walk_time_minutes,
+                                                  self.predict_confidence, realtime=dep['time'])
+            if leave_time is not None:
+                return leave_time, True
+        return dep['time'] - walk_time_minutes * 60, False
+        
+    def refresh_delay_model(self):
+        """(Re)build the delay model from the history when predicting (runs on a fetch thread); errors are logged"""
+        if not self.predict_confidence:
+            return
+        if self.delay_model and self.clock.time() - self.delay_model.built_at < self.model_refresh_seconds:
+            return
+        try:
+            # NumPy is only needed for prediction mode
+            from bus_tracker_stats import DelayModel
+            if self.history:
+                self.history.flush()
+            self.delay_model = (self.delay_model or DelayModel(clock=self.clock)).build()
+        except Exception as e:
+            print(f"Delay model error: {e}", file=sys.stderr)
+        
+    def station_requests(self):
+        """{(station, transport types): watch entries}; entries sharing both share one request"""
+        requests = {}
+        for entry in self.watch_list:
+            requests.setdefault((entry.station, entry.transport_types), []).append(entry)
+        return requests
+        
+    def merge_results(self, results):
+        """Rank fetch_station results (or the exceptions they raised) into (departures, errors, pages)"""
+        departures, errors, degraded = [], [], []
+        pages_fetched = pages_reused = 0
+        for result in results:
+            if isinstance(result, BaseException):
+                self.metrics.inc('errors', ('kind', 'station'))
+                errors.append(str(result) or type(result).__name__)
+                continue
+            matches, fetched, reused = result
+            if matches and all(dep.scheduled for dep in matches):
+                # The timetable stood in for MVG: keep its departures, but the station still failed
+                self.metrics.inc('errors', ('kind', 'timetable'))
+                degraded.append(f"{matches[0].station}: {TIMETABLE_ERROR}")
+            departures.extend(matches)
+            pages_fetched += fetched
+            pages_reused += reused
+        
+        if errors and len(errors) == len(results):
+            raise RuntimeError(errors[0])
+        errors.extend(degraded)
+        
+        departures.sort(key=lambda dep: (dep.leave_time, dep.time))
+        return departures, errors, (pages_fetched, pages_reused)
+        
+    def get_departures(self):
+        """Poll every watched station concurrently and merge into one list ranked by leave time"""
+        futures = [
+            self.fetch_pool.submit(self.fetch_station, station_name, transport_types, entries)
+            for (station_name, transport_types), entries in self.station_requests().items()
+        ]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return self.merge_results(results)
+        
+    def fetch_snapshot(self):
+        """Build an immutable departure snapshot"""
+        self.refresh_delay_model()
+        try:
+            with self.metrics.span('poll'):
+                departures, errors, pages = self.get_departures()
+        except Exception as e:
+            return self.failed_snapshot(e)
+        return self.make_snapshot(departures, errors, pages)
+        
+    def failed_snapshot(self, error):
+        """Snapshot for a poll in which every station failed"""
+        self.metrics.inc('errors', ('kind', 'poll'))
+        return DepartureSnapshot((), self.clock.time(), str(error))
+        
+    def make_snapshot(self, departures, errors, pages):
+        """Freeze a merged poll into a snapshot and save it for the next warm start"""
+        self.metrics.inc('pages_fetched', amount=pages[0])
+        self.metrics.inc('pages_reused', amount=pages[1])
+        if errors and departures and all(dep.scheduled for dep in departures):
+            error = TIMETABLE_ERROR
+        else:
+            error = f"{len(errors)} STATIONS FAILED" if errors else None
+        snapshot = DepartureSnapshot(freeze_departures(departures), self.clock.time(), error, pages)
+        # Timetable rows stand in during an outage; they must not replace the last live board
+        if self.snapshot_store is not None and any(not dep.scheduled for dep in snapshot.departures):
+            with self.metrics.span('snapshot_save'):
+                self.snapshot_store.save(snapshot)
+        return snapshot
+        
+    def load_last_snapshot(self):
+        """The snapshot saved by the last successful fetch of this watch list, or None"""
+        if self.snapshot_store is None:
+            return None
+        return self.snapshot_store.load()
+        
+    def collect_metrics(self):
+        """Cache and poll counters kept by the cache and scheduler themselves"""
+        cache = self.departure_cache.stats()
+        values = {
+            ('cache_hits', None): cache['hits'],
+            ('cache_misses', None): cache['misses'],
+            ('cache_coalesced', None): cache['coalesced'],
+        }
+        if self.poll_scheduler:
+            polls = self.poll_scheduler.stats()
+            values[('polls', None)] = polls['polls']
+            values[('poll_backoffs', None)] = polls['errors']
+            # What polling every update_interval would have cost. Only monotonic values are exported as counters;
+            # requests saved (the difference) shrinks while polling densely, so queries subtract the two instead
+            values[('fixed_interval_polls', None)] = polls['fixed_interval_polls']
+        return values
+        
+    def start(self, initial_delay=0):
+        """Start adaptive background polling; snapshots arrive on fetch_worker.results"""
+        self.poll_scheduler = PollScheduler(baseline_interval=self.update_interval,
+                                            min_interval=max(1, self.update_interval // 2), clock=self.clock)
+        if self.concurrency == 'asyncio':
+            # asyncio takes ~40 ms to import; the UI only starts polling after its first paint
+            from bus_tracker_async import AsyncFetchWorker
+            self.fetch_worker = AsyncFetchWorker(self, self.poll_scheduler)
+        else:
+            self.fetch_worker = DepartureFetchWorker(self.fetch_snapshot, self.poll_scheduler, self.metrics)
+        self.fetch_worker.start(initial_delay)
+        return self.fetch_worker
+        
+    def request_fetch(self):
+        """Fetch now instead of waiting for the next scheduled poll"""
+        if self.fetch_worker:
+            self.fetch_worker.request_fetch()
+        
+    def stop(self):
+        """Stop polling, cut off requests in flight, close pooled connections and flush the history"""
+        if self.fetch_worker:
+            self.fetch_worker.stop()
+        self.source.close()
+        self.fetch_pool.shutdown(wait=False)
+        if self.history:
+            self.history.close()
@@ -0,0 +1,169 @@
+"""Headless tracker: emits departure snapshots and leave-now events as JSON lines, without Tk"""
+import os
+import sys
+import json
+import queue
+import signal
+import argparse
+import threading
+
+from bus_tracker_core import TrackerEngine, load_watch_list, leave_status, snapshot_to_dict
+from bus_tracker_sources import add_source_arguments, source_from_args
+from bus_tracker_timetable import timetable_from_args
+
+
+def snapshot_event(snapshot):
+    """JSON-ready snapshot event"""
+    return dict({'event': 'snapshot'}, **snapshot_to_dict(snapshot))
+
+
+def leave_now_event(dep, now):
+    """JSON-ready event for a departure whose leave time has just come"""
+    _, minutes_until_departure, _ = leave_status(dep, now)
+    return {
+        'event': 'leave_now',
+        'at': now,
+        'station': dep.station,
+        'line': dep.line,
+        'destination': dep.destination,
+        'time': dep.time,
+        'leave_time': dep.leave_time,
+        'leave_predicted': dep.leave_predicted,
+        'minutes_until_departure': minutes_until_departure,
+    }
+
+
+class JsonLinesWriter:
+    """One JSON object per line, flushed immediately so consumers can tail the stream"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def emit(self, event):
+        """Write one event"""
+        self.stream.write(json.dumps(event, ensure_ascii=False) + '\n')
+        self.stream.flush()
+
+
+class LeaveNowDetector:
+    """Report each trip once when it enters the leave-now window"""
+
+    def __init__(self):
+        self.alerted = set()
+
+    def check(self, departures, now):
+        """Departures that reached their leave time since the last check"""
+        due = []
+        current = set()
+        for dep in departures:
+            key = (dep.key, dep.walk_time_minutes)
+            current.add(key)
+            if key not in self.alerted and leave_status(dep, now)[0] == 'leave_now':
+                self.alerted.add(key)
+                due.append(dep)
+        # Forget trips that dropped out of the snapshot so the set stays small
+        self.alerted &= current
+        return due
+
+
+def run(engine, writer, stop, tick=1.0, hub=None, until=None):
+    """Emit every new snapshot (and publish it to hub) and check for leave-now events once per tick"""
+    worker = engine.start()
+    detector = LeaveNowDetector()
+    departures = ()
+    # A replay stops once its clock passes the end of the recording
+    while not stop.is_set() and (until is None or engine.clock.time() <= until):
+        try:
+            snapshot = worker.results.get(timeout=tick)
+        except queue.Empty:
+            snapshot = None
+        if snapshot is not None:
+            writer.emit(snapshot_event(snapshot))
+            if hub is not None:
+                hub.publish(snapshot, worker.next_delay)
+            # A failed fetch keeps the last good departures, like the UI does
+            if snapshot.departures or not snapshot.error:
+                departures = snapshot.departures
+        now = engine.clock.time()
+        for dep in detector.check(departures, now):
+            writer.emit(leave_now_event(dep, now))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Munich Bus Tracker - headless daemon")
+    parser.add_argument('--watchlist', metavar='FILE',
+                        help="JSON watch list of stations and destinations to track")
+    parser.add_argument('--output', metavar='FILE',
+                        help="append JSON lines to FILE instead of stdout")
+    parser.add_argument('--once', action='store_true',
+                        help="emit a single snapshot and exit")
+    parser.add_argument('--serve', metavar='[HOST:]PORT',
+                        help="also serve snapshots over HTTP/SSE for other displays (see bus_tracker_server.py)")
+    parser.add_argument('--metrics', metavar='[HOST:]PORT',
+                        help="serve Prometheus-style timing metrics on /metrics")
+    parser.add_argument('--no-history', action='store_true',
+                        help="do not record observed departures to the on-disk history")
+    parser.add_argument('--predict', type=float, metavar='CONFIDENCE',
+                        help="suggest leave times from recorded delays, e.g. 0.95 (requires numpy)")
+    parser.add_argument('--concurrency', choices=('asyncio', 'threads'), default='asyncio',
+                        help="run polls and fetches as asyncio tasks with timeouts, or on a plain worker thread")
+    add_source_arguments(parser)
+    args = parser.parse_args()
+    if args.predict is not None:
+        if not 0.5 <= args.predict < 1:
+            parser.error("--predict must be between 0.5 and 1")
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            parser.error("--predict requires numpy (pip install numpy)")
+
+    watch_list = load_watch_list(args.watchlist) if args.watchlist else None
+    source, clock = source_from_args(args, watch_list)
+    engine = TrackerEngine(watch_list, history=not args.no_history, predict_confidence=args.predict,
+                           source=source, clock=clock, timetable=timetable_from_args(args),
+                           concurrency=args.concurrency)
+    engine.load_cached_stations()
+
+    stream = open(args.output, 'a', encoding='utf-8') if args.output else sys.stdout
+    writer = JsonLinesWriter(stream)
+    try:
+        if args.once:
+            snapshot = engine.fetch_snapshot()
+            writer.emit(snapshot_event(snapshot))
+            return 1 if snapshot.error and not snapshot.departures else 0
+
+        hub = server = metrics_server = None
+        if args.serve:
+            from bus_tracker_server import SnapshotHub, SnapshotServer, parse_address
+            hub = SnapshotHub()
+            server = SnapshotServer(parse_address(args.serve), hub, refresh=engine.request_fetch,
+                                    metrics=engine.metrics)
+            server.start()
+        if args.metrics:
+            from bus_tracker_server import MetricsServer, parse_address
+            metrics_server = MetricsServer(parse_address(args.metrics), engine.metrics)
+            metrics_server.start()
+
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+        try:
+            run(engine, writer, stop, hub=hub, until=getattr(clock, 'end', None))
+        except KeyboardInterrupt:
+            pass
+        except BrokenPipeError:
+            # The reader went away (e.g. piped into head); silence the final flush at exit
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        finally:
+            if server:
+                server.stop()
+            if metrics_server:
+                metrics_server.stop()
+        return 0
+    finally:
+        engine.stop()
+        if stream is not sys.stdout:
+            stream.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
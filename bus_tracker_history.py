@@ -0,0 +1,263 @@
+"""Compact append-only log of observed departures with memory-mapped time-range queries"""
+import os
+import json
+import mmap
+import struct
+import threading
+import time
+from collections import namedtuple
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no advisory locks, so run a single writer (the UI or the daemon) per history directory
+    fcntl = None
+
+# observed, planned, realtime (epoch s), delay (s), line, destination, station (string ids), flags
+RECORD = struct.Struct('<IIIhHHHB')
+RECORD_SIZE = RECORD.size
+FLAG_CANCELLED = 1
+
+RECORDS_FILE = 'observations.bin'
+STRINGS_FILE = 'strings.jsonl'
+LOCK_FILE = 'writer.lock'
+
+Observation = namedtuple('Observation', ['observed', 'planned', 'realtime', 'delay', 'line',
+                                         'destination', 'station', 'cancelled'])
+
+
+def default_history_dir():
+    """Per-user data directory for the departure history"""
+    base = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    return os.path.join(base, 'munich-bus-tracker', 'history')
+
+
+def load_strings(directory):
+    """Read the string table (line, destination and station names) in id order"""
+    try:
+        with open(os.path.join(directory, STRINGS_FILE), encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.endswith('\n')]
+    except OSError:
+        return []
+
+
+def repair(directory):
+    """Cut off a torn trailing record or string left by an interrupted write, so appends stay aligned"""
+    path = os.path.join(directory, RECORDS_FILE)
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        size = 0
+    if size % RECORD_SIZE:
+        os.truncate(path, size - size % RECORD_SIZE)
+
+    path = os.path.join(directory, STRINGS_FILE)
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return
+    if data and not data.endswith(b'\n'):
+        os.truncate(path, data.rfind(b'\n') + 1)
+
+
+class HistoryStore:
+    """Batched writer that appends a record whenever a trip's realtime or cancelled state changes
+
+    Only one store may write a directory at a time: string ids are assigned in memory, so two writers
+    would hand out clashing ids. A second store raises OSError on platforms with fcntl.
+    """
+
+    def __init__(self, directory=None, batch_size=256, flush_interval=60, forget_after=3 * 3600, clock=None):
+        self.directory = directory or default_history_dir()
+        self.now = clock.time if clock else time.time  # replays record in their virtual time
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock_file = self._acquire_writer_lock()
+        repair(self.directory)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.forget_after = forget_after  # drop change-tracking state for trips planned this long ago
+        self._lock = threading.Lock()
+        self._strings = {name: i for i, name in enumerate(load_strings(self.directory))}
+        self._pending_strings = []
+        self._buffer = bytearray()
+        self._buffered = 0
+        self._first_buffered_at = None
+        self._last_seen = {}  # (station, line, planned, destination) ids -> (realtime, flags)
+        self.records_written = 0
+        # Readers binary-search on observation time, so appends must never go back in time
+        self.last_observed = self._last_observed_on_disk()
+
+    def _acquire_writer_lock(self):
+        if fcntl is None:
+            return None
+        lock_file = open(os.path.join(self.directory, LOCK_FILE), 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            raise OSError(f"history in {self.directory} is being written by another tracker") from None
+        return lock_file
+
+    def _last_observed_on_disk(self):
+        try:
+            with open(os.path.join(self.directory, RECORDS_FILE), 'rb') as f:
+                count = os.fstat(f.fileno()).st_size // RECORD_SIZE
+                if not count:
+                    return 0
+                f.seek((count - 1) * RECORD_SIZE)
+                return RECORD.unpack(f.read(RECORD_SIZE))[0]
+        except OSError:
+            return 0
+
+    def _string_id(self, name):
+        string_id = self._strings.get(name)
+        if string_id is None:
+            string_id = self._strings[name] = len(self._strings)
+            if string_id > 0xFFFF:
+                raise OverflowError("history string table is full")
+            self._pending_strings.append(name)
+        return string_id
+
+    def record(self, station, departures, observed=None):
+        """Record MVG departure dicts seen at a station; unchanged trips are skipped"""
+        with self._lock:
+            # Stamped under the lock so concurrent fetch threads append in observation order
+            observed = int(self.now() if observed is None else observed)
+            if observed < self.last_observed:
+                raise ValueError(f"observation at {observed} predates the last recorded one at {self.last_observed}")
+            station_id = self._string_id(station)
+            for dep in departures:
+                line_id = self._string_id(dep['line'])
+                destination_id = self._string_id(dep['destination'])
+                flags = FLAG_CANCELLED if dep.get('cancelled') else 0
+                key = (station_id, line_id, dep['planned'], destination_id)
+                state = (dep['time'], flags)
+                if self._last_seen.get(key) == state:
+                    continue
+                self._last_seen[key] = state
+                delay = max(-0x8000, min(0x7FFF, dep['time'] - dep['planned']))
+                self._buffer += RECORD.pack(observed, dep['planned'], dep['time'], delay,
+                                            line_id, destination_id, station_id, flags)
+                self._buffered += 1
+                self.last_observed = observed
+
+            if self._buffered and self._first_buffered_at is None:
+                self._first_buffered_at = observed
+            due = self._first_buffered_at is not None and observed - self._first_buffered_at >= self.flush_interval
+            if self._buffered >= self.batch_size or due:
+                self._flush_locked()
+                self._forget_old(observed)
+
+    def _forget_old(self, now):
+        cutoff = now - self.forget_after
+        self._last_seen = {key: state for key, state in self._last_seen.items() if key[2] >= cutoff}
+
+    def flush(self):
+        """Write buffered strings and records to disk"""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        # Strings go first so every record on disk refers to a known name
+        if self._pending_strings:
+            with open(os.path.join(self.directory, STRINGS_FILE), 'a', encoding='utf-8') as f:
+                f.write(''.join(json.dumps(name, ensure_ascii=False) + '\n' for name in self._pending_strings))
+            self._pending_strings = []
+        if self._buffer:
+            with open(os.path.join(self.directory, RECORDS_FILE), 'ab') as f:
+                f.write(self._buffer)
+            self.records_written += self._buffered
+            self._buffer = bytearray()
+            self._buffered = 0
+        self._first_buffered_at = None
+
+    def close(self):
+        """Flush everything that is still buffered and let other writers in"""
+        self.flush()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+
+class HistoryReader:
+    """Memory-mapped reader; records are in observation order, so time ranges are binary searches"""
+
+    def __init__(self, directory=None):
+        self.directory = directory or default_history_dir()
+        self.path = os.path.join(self.directory, RECORDS_FILE)
+        self._file = None
+        self._map = None
+        self.count = 0
+        self.refresh()
+
+    def refresh(self):
+        """Re-map the log to pick up records appended since opening"""
+        self.close()
+        self.strings = load_strings(self.directory)
+        self._ids = {name: i for i, name in enumerate(self.strings)}
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+        # A torn trailing record is ignored here; the next HistoryStore cuts it off
+        self.count = size // RECORD_SIZE
+        if self.count:
+            self._file = open(self.path, 'rb')
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        """Release the memory map"""
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # Arrays built on buffer() still reference the map; it is unmapped once they are gone
+                pass
+            self._file.close()
+        self._map = self._file = None
+        self.count = 0
+
+    def buffer(self):
+        """The memory-mapped records (count * RECORD_SIZE bytes) for bulk readers such as NumPy"""
+        if self._map is None:
+            return b''
+        return self._map
+
+    def _observed_at(self, index):
+        return struct.unpack_from('<I', self._map, index * RECORD_SIZE)[0]
+
+    def bisect(self, timestamp):
+        """Index of the first record observed at or after timestamp"""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._observed_at(middle) < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def query(self, line=None, t0=0, t1=0xFFFFFFFF, station=None, destination=None):
+        """Observations made in [t0, t1), optionally for one line, station and destination"""
+        filters = []
+        for name, field in ((line, 4), (destination, 5), (station, 6)):
+            if name is not None:
+                if name not in self._ids:
+                    return []
+                filters.append((field, self._ids[name]))
+
+        start, stop = self.bisect(t0), self.bisect(t1)
+        if start >= stop:
+            return []
+
+        strings = self.strings
+        # Slicing the map pages in only the requested range
+        results = []
+        for record in RECORD.iter_unpack(self._map[start * RECORD_SIZE:stop * RECORD_SIZE]):
+            if all(record[field] == wanted for field, wanted in filters):
+                observed, planned, realtime, delay, line_id, destination_id, station_id, flags = record
+                results.append(Observation(observed, planned, realtime, delay, strings[line_id],
+                                           strings[destination_id], strings[station_id],
+                                           bool(flags & FLAG_CANCELLED)))
+        return results
@@ -0,0 +1,169 @@
+"""Timing spans, histograms and counters for the hot paths, rendered in the Prometheus text format"""
+import time
+import threading
+from contextlib import contextmanager
+
+# Upper bounds in seconds, from a cheap animation frame up to a timed-out MVG request
+SPAN_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram:
+    """Cumulative-bucket histogram of durations in seconds"""
+
+    def __init__(self, buckets=SPAN_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        """Add one duration"""
+        index = 0
+        while index < len(self.buckets) and seconds > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q):
+        """Estimated q-quantile in seconds, interpolated inside its bucket; None while empty"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for index, bucket_count in enumerate(self.counts):
+            upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+            if bucket_count and seen + bucket_count >= rank:
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+            lower = upper
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """Span histograms and counters shared by the engine, the fetch worker and the UI"""
+
+    def __init__(self, prefix='bus_tracker'):
+        self.prefix = prefix
+        self.spans = {}  # span name -> Histogram
+        self.counters = {}  # (name, label) -> value
+        self.collectors = []  # callables returning {(name, label): value} read at scrape time
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds):
+        """Record one duration for a span"""
+        with self._lock:
+            histogram = self.spans.get(name)
+            if histogram is None:
+                histogram = self.spans[name] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def span(self, name):
+        """Time the enclosed block, including blocks that raise"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def timed(self, name, function):
+        """Wrap function so every call is recorded as a span"""
+        def wrapper(*args, **kwargs):
+            with self.span(name):
+                return function(*args, **kwargs)
+        return wrapper
+
+    def inc(self, name, label=None, amount=1):
+        """Add to a counter; label is an optional (key, value) pair"""
+        key = (name, label)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def add_collector(self, collect):
+        """Counters owned elsewhere (e.g. cache statistics), read each time metrics are rendered"""
+        self.collectors.append(collect)
+
+    def counter_values(self):
+        """Every counter, including collected ones, as {(name, label): value}"""
+        with self._lock:
+            values = dict(self.counters)
+        for collect in self.collectors:
+            values.update(collect())
+        return values
+
+    def summary(self):
+        """{span: (count, p50 ms, p95 ms)} for the on-screen overlay"""
+        with self._lock:
+            return {name: (h.count, h.quantile(0.5) * 1000, h.quantile(0.95) * 1000)
+                    for name, h in sorted(self.spans.items()) if h.count}
+
+    def render(self):
+        """Prometheus text exposition of every span histogram and counter"""
+        lines = []
+        span_metric = f'{self.prefix}_span_seconds'
+        with self._lock:
+            spans = [(name, list(h.counts), h.count, h.sum, h.buckets) for name, h in sorted(self.spans.items())]
+        if spans:
+            lines.append(f'# HELP {span_metric} Time spent in instrumented hot paths.')
+            lines.append(f'# TYPE {span_metric} histogram')
+        for name, counts, count, total, buckets in spans:
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{span_metric}_bucket{{span="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{span_metric}_bucket{{span="{name}",le="+Inf"}} {count}')
+            lines.append(f'{span_metric}_sum{{span="{name}"}} {total:.6f}')
+            lines.append(f'{span_metric}_count{{span="{name}"}} {count}')
+
+        typed = set()
+        for (name, label), value in sorted(self.counter_values().items(), key=lambda item: (item[0][0], item[0][1] or ())):
+            metric = f'{self.prefix}_{name}_total'
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f'# TYPE {metric} counter')
+            labels = f'{{{label[0]}="{label[1]}"}}' if label else ''
+            lines.append(f'{metric}{labels} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+class StartupTrace:
+    """Start-up milestones in seconds since launch, also observed as startup_<name> spans once attached"""
+
+    def __init__(self, started=None):
+        self.started = time.perf_counter() if started is None else started
+        self.marks = {}  # name -> seconds since started
+        self.metrics = None
+
+    def attach(self, metrics):
+        """Send milestones to a registry, including those marked before it existed"""
+        self.metrics = metrics
+        for name, seconds in self.marks.items():
+            metrics.observe(f'startup_{name}', seconds)
+
+    def mark(self, name, at=None):
+        """Record a milestone the first time it is reached; False if it already was"""
+        if name in self.marks:
+            return False
+        self.marks[name] = (time.perf_counter() if at is None else at) - self.started
+        if self.metrics:
+            self.metrics.observe(f'startup_{name}', self.marks[name])
+        return True
+
+    def report(self):
+        """Import and UI build durations, then time to the first paint and to the first live data"""
+        marks = self.marks
+        parts = []
+        if 'imports' in marks:
+            parts.append(f"imports {marks['imports'] * 1000:.0f} ms")
+        if 'ui_built' in marks:
+            parts.append(f"ui build {(marks['ui_built'] - marks.get('ui_started', 0)) * 1000:.0f} ms")
+        if 'first_paint' in marks:
+            parts.append(f"first paint {marks['first_paint'] * 1000:.0f} ms")
+        if 'first_live' in marks:
+            parts.append(f"first live data {marks['first_live'] * 1000:.0f} ms")
+        return 'startup: ' + ', '.join(parts)
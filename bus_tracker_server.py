@@ -0,0 +1,317 @@
+"""Local HTTP/JSON and Server-Sent-Events feed so many displays share one upstream poller"""
+import sys
+import json
+import time
+import queue
+import random
+import threading
+import http.client
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+from bus_tracker_core import DepartureSnapshot, snapshot_to_dict, snapshot_from_dict
+from bus_tracker_metrics import CONTENT_TYPE
+
+DEFAULT_PORT = 8765
+
+
+def parse_address(value, default_host='127.0.0.1'):
+    """(host, port) from '[host:]port'"""
+    host, _, port = value.rpartition(':')
+    return host or default_host, int(port)
+
+
+class SnapshotHub:
+    """Latest snapshot, encoded once and shared by every subscriber, with a version to wait on"""
+
+    def __init__(self):
+        self.version = 0
+        self.body = None
+        self.published_at = None
+        self.closed = False
+        self._changed = threading.Condition()
+
+    def publish(self, snapshot, next_fetch_in=None):
+        """Make a snapshot the latest one and wake every waiting subscriber"""
+        with self._changed:
+            self.version += 1
+            payload = dict(snapshot_to_dict(snapshot), version=self.version, next_fetch_in=next_fetch_in)
+            self.body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.published_at = time.time()
+            self._changed.notify_all()
+
+    def latest(self):
+        """(version, encoded body) of the current snapshot; body is None before the first publish"""
+        with self._changed:
+            return self.version, self.body
+
+    def wait_newer(self, version, timeout):
+        """(version, body) once a snapshot newer than version exists, or (version, None) on timeout"""
+        with self._changed:
+            if not self._changed.wait_for(lambda: self.version > version or self.closed, timeout):
+                return version, None
+            if self.closed:
+                return version, None
+            return self.version, self.body
+
+    def close(self):
+        """Release every waiting subscriber"""
+        with self._changed:
+            self.closed = True
+            self._changed.notify_all()
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """GET /metrics"""
+
+    server_version = 'MunichBusTracker/1'
+
+    def log_message(self, format, *args):
+        # Scrapers poll every few seconds; keep them out of the log
+        pass
+
+    def do_GET(self):
+        if urlsplit(self.path).path != '/metrics':
+            self.send_error(404)
+            return
+        send_metrics(self, self.server.metrics)
+
+
+def send_metrics(handler, metrics):
+    """Answer a request handler with the current metrics"""
+    body = metrics.render().encode('utf-8')
+    handler.send_response(200)
+    handler.send_header('Content-Type', CONTENT_TYPE)
+    handler.send_header('Content-Length', str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """Standalone /metrics endpoint for trackers that do not serve the snapshot feed"""
+
+    daemon_threads = True
+
+    def __init__(self, address, metrics):
+        self.metrics = metrics
+        super().__init__(address, MetricsRequestHandler)
+
+    def start(self):
+        """Serve on a background thread"""
+        thread = threading.Thread(target=self.serve_forever, name='metrics-server', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        """Stop serving"""
+        self.shutdown()
+        self.server_close()
+
+
+class SnapshotRequestHandler(BaseHTTPRequestHandler):
+    """GET /snapshot (long-poll with ?since=VERSION), GET /events (SSE), GET /metrics, POST /refresh"""
+
+    server_version = 'MunichBusTracker/1'
+
+    def log_message(self, format, *args):
+        # One line per request would swamp the log with hundreds of displays
+        pass
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/snapshot':
+            self.send_snapshot(parse_qs(url.query))
+        elif url.path == '/events':
+            self.stream_events()
+        elif url.path == '/metrics' and self.server.metrics:
+            send_metrics(self, self.server.metrics)
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        if urlsplit(self.path).path != '/refresh':
+            self.send_error(404)
+            return
+        if self.server.refresh:
+            self.server.refresh()
+        self.send_response(202)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def send_snapshot(self, query):
+        hub = self.server.hub
+        try:
+            since = int(query.get('since', ['-1'])[0])
+            timeout = min(float(query.get('timeout', ['25'])[0]), self.server.max_wait)
+        except ValueError:
+            self.send_error(400, "since and timeout must be numbers")
+            return
+
+        version, body = hub.latest()
+        # A since ahead of the hub means the server restarted; the current snapshot is news then
+        if body is None or version == since:
+            version, body = hub.wait_newer(version, timeout)
+        if body is None:
+            # Nothing new within the timeout; the client simply asks again
+            self.send_response(204)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_events(self):
+        hub = self.server.hub
+        try:
+            version = int(self.headers.get('Last-Event-ID', '0'))
+        except ValueError:
+            version = 0
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.close_connection = True
+
+        latest, body = hub.latest()
+        if body is None or latest == version:
+            latest, body = hub.wait_newer(version, self.server.keepalive)
+        try:
+            while not hub.closed:
+                if body is None:
+                    # Comment lines keep proxies and the client's read timeout from closing an idle stream
+                    self.wfile.write(b': keepalive\n\n')
+                else:
+                    version = latest
+                    self.wfile.write(b'id: %d\nevent: snapshot\ndata: %s\n\n' % (version, body))
+                self.wfile.flush()
+                latest, body = hub.wait_newer(version, self.server.keepalive)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class SnapshotServer(ThreadingHTTPServer):
+    """Threaded server for the snapshot feed; one cheap thread per subscriber"""
+
+    daemon_threads = True
+    request_queue_size = 128  # hundreds of displays may reconnect at once after a restart
+
+    def __init__(self, address, hub, refresh=None, keepalive=15, max_wait=60, metrics=None):
+        self.hub = hub
+        self.refresh = refresh
+        self.metrics = metrics  # MetricsRegistry served on /metrics, if any
+        self.keepalive = keepalive
+        self.max_wait = max_wait
+        super().__init__(address, SnapshotRequestHandler)
+
+    def start(self):
+        """Serve on a background thread"""
+        thread = threading.Thread(target=self.serve_forever, name='snapshot-server', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        """Stop serving and end every open stream"""
+        self.hub.close()
+        self.shutdown()
+        self.server_close()
+
+
+class FeedClient:
+    """Consume a tracker's /events stream; a drop-in for DepartureFetchWorker in the UI"""
+
+    def __init__(self, url, keepalive=15, max_retry=30):
+        parts = urlsplit(url if '//' in url else f'http://{url}')
+        self.host = parts.hostname or '127.0.0.1'
+        self.port = parts.port or DEFAULT_PORT
+        self.base_path = parts.path.rstrip('/')
+        self.keepalive = keepalive
+        self.max_retry = max_retry
+        self.next_delay = None
+        self.results = queue.Queue()
+        self.last_event_id = 0
+        self._stopped = threading.Event()
+        self._connection = None
+        self._thread = None
+
+    def start(self, initial_delay=0):
+        """Start the stream reader thread"""
+        self._thread = threading.Thread(target=self._run, args=(initial_delay,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop reading and close the stream"""
+        self._stopped.set()
+        connection = self._connection
+        if connection is not None:
+            connection.close()
+
+    def request_fetch(self):
+        """Ask the serving tracker to poll MVG now; its answer arrives on the stream"""
+        threading.Thread(target=self._post_refresh, daemon=True).start()
+
+    def _post_refresh(self):
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=5)
+        try:
+            connection.request('POST', f'{self.base_path}/refresh')
+            connection.getresponse().read()
+        except (OSError, http.client.HTTPException) as e:
+            print(f"Feed refresh error: {e}", file=sys.stderr)
+        finally:
+            connection.close()
+
+    def _run(self, initial_delay):
+        delay = initial_delay
+        retry = 1
+        while not self._stopped.wait(delay):
+            try:
+                self._stream()
+                retry = 1
+                delay = 0
+            except (OSError, http.client.HTTPException, ValueError) as e:
+                if self._stopped.is_set():
+                    break
+                self.results.put(DepartureSnapshot((), time.time(), f"FEED: {e}"))
+                # Jittered backoff so displays do not reconnect in lockstep after a server restart
+                delay = retry / 2 + random.uniform(0, retry / 2)
+                retry = min(self.max_retry, retry * 2)
+
+    def _stream(self):
+        # Keep-alive comments arrive every keepalive seconds, so a longer silence means a dead server
+        self._connection = connection = http.client.HTTPConnection(self.host, self.port, timeout=self.keepalive * 3)
+        try:
+            headers = {'Accept': 'text/event-stream'}
+            if self.last_event_id:
+                headers['Last-Event-ID'] = str(self.last_event_id)
+            connection.request('GET', f'{self.base_path}/events', headers=headers)
+            response = connection.getresponse()
+            if response.status != 200:
+                raise http.client.HTTPException(f"feed answered {response.status}")
+
+            event_id, data = None, []
+            while not self._stopped.is_set():
+                line = response.readline()
+                if not line:
+                    raise ConnectionResetError("feed closed the stream")
+                line = line.rstrip(b'\r\n')
+                if line.startswith(b'id:'):
+                    event_id = int(line[3:])
+                elif line.startswith(b'data:'):
+                    data.append(line[5:].strip())
+                elif not line and data:
+                    self._deliver(event_id, b'\n'.join(data))
+                    event_id, data = None, []
+        finally:
+            connection.close()
+
+    def _deliver(self, event_id, data):
+        payload = json.loads(data)
+        if event_id is not None:
+            self.last_event_id = event_id
+        self.next_delay = payload.get('next_fetch_in')
+        self.results.put(snapshot_from_dict(payload))
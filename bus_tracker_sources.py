@@ -0,0 +1,291 @@
+"""Departure sources for offline runs: recorder, replay, synthetic timetable and fault injection"""
+import json
+import time
+import random
+import bisect
+import threading
+import zlib
+
+from bus_tracker_core import (DepartureSource, MvgSource, DeparturesClient, SYSTEM_CLOCK, ALL_TRANSPORT_TYPES,
+                              api_error, default_watch_list, fetch_worker_count)
+
+
+class VirtualClock:
+    """Clock starting at a chosen epoch; runs speed times faster than wall time, or only on demand"""
+
+    def __init__(self, start=None, speed=1.0, end=None):
+        self.start = time.time() if start is None else start
+        self.speed = speed  # None: time moves only through sleep, wait and advance (as fast as possible)
+        self.end = end  # where a replay runs out, if any
+        self._origin = time.monotonic()
+        self._offset = 0.0
+        self._lock = threading.Lock()
+
+    def time(self):
+        """Current virtual epoch seconds"""
+        with self._lock:
+            elapsed = (time.monotonic() - self._origin) * self.speed if self.speed else 0.0
+            return self.start + elapsed + self._offset
+
+    def advance(self, seconds):
+        """Jump forward in virtual time"""
+        with self._lock:
+            self._offset += seconds
+
+    def sleep(self, seconds):
+        """Block for seconds of virtual time"""
+        if self.speed:
+            time.sleep(seconds / self.speed)
+        else:
+            self.advance(seconds)
+
+    def wait(self, event, seconds):
+        """Wait on a threading.Event for up to seconds of virtual time; True if it was set"""
+        if self.speed:
+            return event.wait(None if seconds is None else seconds / self.speed)
+        if event.is_set():
+            return True
+        self.advance(seconds or 0)
+        return event.is_set()
+
+    async def wait_async(self, event, seconds):
+        """Await an asyncio.Event for up to seconds of virtual time; True if it was set"""
+        import asyncio
+        if not self.speed:
+            if not event.is_set():
+                self.advance(seconds or 0)
+                # Let other tasks run, as a real wait would
+                await asyncio.sleep(0)
+            return event.is_set()
+        try:
+            await asyncio.wait_for(event.wait(), None if seconds is None else seconds / self.speed)
+        except asyncio.TimeoutError:
+            pass
+        return event.is_set()
+
+
+class RecordingSource(DepartureSource):
+    """Pass calls through to another source and append every raw response to a JSON-lines file"""
+
+    def __init__(self, inner, path, clock=None):
+        self.inner = inner
+        self.client = inner.client
+        self.live = inner.live
+        self.clock = clock or SYSTEM_CLOCK
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def _write(self, record):
+        line = json.dumps(dict(record, at=self.clock.time()), ensure_ascii=False) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def station(self, query):
+        result = self.inner.station(query)
+        self._write({'kind': 'station', 'query': query, 'result': result})
+        return result
+
+    def cached_station(self, query, station):
+        # Without this, recordings made with a warm station cache could not be replayed
+        self._write({'kind': 'station', 'query': query, 'result': station})
+        self.inner.cached_station(query, station)
+
+    def raw_departures(self, station_id, limit=10, offset=0, transport_types=None):
+        record = {'kind': 'departures', 'station_id': station_id, 'limit': limit, 'offset': offset,
+                  'transport_types': sorted(transport_types or ALL_TRANSPORT_TYPES)}
+        try:
+            result = self.inner.raw_departures(station_id, limit, offset, transport_types)
+        except Exception as e:
+            self._write(dict(record, error=str(e)))
+            raise
+        self._write(dict(record, result=result))
+        return result
+
+    def close(self):
+        self.inner.close()
+        with self._lock:
+            self._file.close()
+
+
+class ReplaySource(DepartureSource):
+    """Serve a recording back by clock time: each query sees the departures board as it was recorded then"""
+
+    def __init__(self, path, clock=None, max_age=600):
+        self.clock = clock or SYSTEM_CLOCK
+        self.max_age = max_age  # ignore recorded responses older than this when rebuilding a board
+        self.stations = {}
+        self._responses = {}  # (station_id, transport types) -> ([at], [(at, offset, result, error)])
+        with open(path, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        records.sort(key=lambda record: record['at'])
+        for record in records:
+            if record['kind'] == 'station':
+                self.stations[record['query']] = record['result']
+            elif record['kind'] == 'departures':
+                key = (record['station_id'], tuple(record['transport_types']))
+                times, responses = self._responses.setdefault(key, ([], []))
+                times.append(record['at'])
+                responses.append((record['at'], record['offset'], record.get('result'), record.get('error')))
+        # The replay window spans the recorded departure responses
+        times = [record['at'] for record in records if record['kind'] == 'departures']
+        self.start = times[0] if times else None
+        self.end = times[-1] if times else None
+
+    def station(self, query):
+        return self.stations.get(query)
+
+    def raw_departures(self, station_id, limit=10, offset=0, transport_types=None):
+        key = (station_id, tuple(sorted(transport_types or ALL_TRANSPORT_TYPES)))
+        times, responses = self._responses.get(key, ((), ()))
+        now = self.clock.time()
+        last = bisect.bisect_right(times, now)
+        if not last:
+            return []
+        if responses[last - 1][3]:
+            # The upstream call recorded at this moment failed; fail the same way
+            raise api_error(responses[last - 1][3])
+
+        # Merge the recent pages so any offset can be answered, newest observation of each trip winning
+        trips = {}
+        for at, _, result, error in responses[bisect.bisect_left(times, now - self.max_age):last]:
+            for departure in result or ():
+                trips[(departure['label'], departure['plannedDepartureTime'], departure['destination'])] = departure
+        earliest = (now + offset * 60) * 1000
+        board = sorted((d for d in trips.values() if d['realtimeDepartureTime'] >= earliest),
+                       key=lambda d: d['realtimeDepartureTime'])
+        return board[:limit]
+
+
+class SyntheticSource(DepartureSource):
+    """Deterministic fake timetable: every station has lines at fixed headways with seeded delays"""
+
+    def __init__(self, clock=None, lines=(('X201', 'Garching, Forschungszentrum (U)'),), headway_minutes=10,
+                 max_delay=240, cancel_rate=0.0, transport_type='REGIONAL_BUS', seed=0):
+        self.clock = clock or SYSTEM_CLOCK
+        self.lines = tuple(lines)
+        self.headway = headway_minutes * 60
+        self.max_delay = max_delay
+        self.cancel_rate = cancel_rate
+        self.transport_type = transport_type
+        self.seed = seed
+
+    def station(self, query):
+        return {'id': f'fake:{zlib.crc32(query.encode("utf-8")):08x}', 'name': query}
+
+    def _trip(self, station_id, line, destination, planned):
+        # Seeded by the trip itself, so every query for the same trip agrees
+        rnd = random.Random(f'{self.seed}:{station_id}:{line}:{planned}')
+        delay = int(rnd.random() ** 3 * self.max_delay)
+        return {
+            'plannedDepartureTime': planned * 1000,
+            'realtimeDepartureTime': (planned + delay) * 1000,
+            'label': line,
+            'destination': destination,
+            'transportType': self.transport_type,
+            'cancelled': rnd.random() < self.cancel_rate,
+            'messages': [],
+        }
+
+    def raw_departures(self, station_id, limit=10, offset=0, transport_types=None):
+        if transport_types and self.transport_type not in transport_types:
+            return []
+        start = int(self.clock.time()) + offset * 60
+        departures = []
+        for index, (line, destination) in enumerate(self.lines):
+            # Stagger lines within the headway; look back max_delay for trips still to depart
+            phase = (index * self.headway) // max(1, len(self.lines))
+            planned = start - self.max_delay - (start - self.max_delay - phase) % self.headway
+            found = 0
+            while found < limit:
+                trip = self._trip(station_id, line, destination, planned)
+                if trip['realtimeDepartureTime'] >= start * 1000:
+                    departures.append(trip)
+                    found += 1
+                planned += self.headway
+        departures.sort(key=lambda d: d['realtimeDepartureTime'])
+        return departures[:limit]
+
+
+class FaultySource(DepartureSource):
+    """Wrap a source with injected latency and errors"""
+
+    def __init__(self, inner, latency=0.0, jitter=0.0, error_rate=0.0, seed=None, clock=None):
+        self.inner = inner
+        self.client = inner.client
+        # Injected failures are not MVG's: keep them out of the history, station cache and saved snapshot
+        self.live = False
+        self.latency = latency  # seconds of clock time added to every call
+        self.jitter = jitter  # plus up to this much at random
+        self.error_rate = error_rate
+        self.clock = clock or SYSTEM_CLOCK
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._closed = threading.Event()  # close() cuts injected latency short, as it cuts real requests
+        self.injected_errors = 0
+
+    def _fault(self):
+        with self._lock:
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            fail = self._random.random() < self.error_rate
+            if fail:
+                self.injected_errors += 1
+        if delay and self.clock.wait(self._closed, delay):
+            raise ConnectionAbortedError("source is closed")
+        if fail:
+            raise api_error("Injected fault: MVG API unavailable")
+
+    def station(self, query):
+        self._fault()
+        return self.inner.station(query)
+
+    def raw_departures(self, station_id, limit=10, offset=0, transport_types=None):
+        self._fault()
+        return self.inner.raw_departures(station_id, limit, offset, transport_types)
+
+    def cached_station(self, query, station):
+        self.inner.cached_station(query, station)
+
+    def close(self):
+        self._closed.set()
+        self.inner.close()
+
+
+def add_source_arguments(parser):
+    """Command-line options selecting the departure source"""
+    group = parser.add_argument_group('departure source')
+    group.add_argument('--record', metavar='FILE', help="append every raw MVG response to FILE")
+    group.add_argument('--replay', metavar='FILE', help="serve departures from a --record file instead of MVG")
+    group.add_argument('--fake', action='store_true', help="serve a synthetic timetable instead of MVG")
+    group.add_argument('--speed', type=float, default=1.0,
+                       help="replay/fake clock speed, e.g. 60 for an hour per minute (0: as fast as possible)")
+    group.add_argument('--latency', type=float, default=0.0, metavar='SECONDS', help="inject latency per request")
+    group.add_argument('--error-rate', type=float, default=0.0, metavar='P', help="inject failures with probability P")
+    group.add_argument('--timetable', metavar='FILE',
+                       help="scheduled departures to show while MVG is unreachable (see bus_tracker_timetable.py);"
+                            " live runs use an imported default index automatically")
+
+
+def source_from_args(args, watch_list=None):
+    """(source, clock) for parsed add_source_arguments options; (None, None) means live MVG
+
+    A live client is sized for watch_list (default: the single default target) like TrackerEngine sizes its own.
+    """
+    clock = None
+    if args.replay:
+        source = ReplaySource(args.replay)
+        clock = source.clock = VirtualClock(source.start, args.speed or None, end=source.end)
+    elif args.fake:
+        clock = VirtualClock(speed=args.speed or None)
+        source = SyntheticSource(clock)
+    elif args.record or args.latency or args.error_rate:
+        source = MvgSource(DeparturesClient(pool_size=fetch_worker_count(watch_list or default_watch_list())))
+    else:
+        return None, None
+
+    if args.record:
+        source = RecordingSource(source, args.record, clock)
+    if args.latency or args.error_rate:
+        source = FaultySource(source, latency=args.latency, error_rate=args.error_rate, clock=clock)
+    return source, clock
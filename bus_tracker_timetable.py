@@ -0,0 +1,315 @@
+"""Offline timetable fallback: a GTFS feed reduced to the watch list, indexed for next-departure lookups
+
+Build the index once from a GTFS feed (zip or unpacked directory):
+
+    python bus_tracker_timetable.py gtfs.zip --watchlist watchlist.json
+
+Trips are expanded into concrete departures for each service day, so the index is sorted by
+(service day, time) in one epoch column and "next K departures after now" is a binary search.
+"""
+import os
+import io
+import sys
+import json
+import array
+import bisect
+import argparse
+from datetime import date, datetime, timedelta
+
+from bus_tracker_core import TRANSPORT_TYPES, default_cache_dir, default_watch_list, load_watch_list
+
+MAGIC = b'MBTT1\n'
+
+# GTFS route_type (basic and extended) -> MVG transport type names it can stand for
+ROUTE_TYPES = {
+    0: ('TRAM',), 1: ('UBAHN',), 2: ('BAHN', 'SBAHN'), 3: ('BUS', 'REGIONAL_BUS', 'SEV'), 4: ('SCHIFF',),
+    109: ('SBAHN',), 400: ('UBAHN',), 401: ('UBAHN',), 700: ('BUS', 'REGIONAL_BUS'), 701: ('REGIONAL_BUS',),
+    702: ('BUS',), 714: ('SEV',), 900: ('TRAM',), 1000: ('SCHIFF',),
+}
+# Extended types not listed above fall back to their hundred
+ROUTE_TYPE_GROUPS = {1: ('BAHN', 'SBAHN'), 4: ('UBAHN',), 7: ('BUS', 'REGIONAL_BUS', 'SEV'), 9: ('TRAM',),
+                     10: ('SCHIFF',)}
+
+
+def default_timetable_path():
+    """Where the UI and daemon look for an imported timetable"""
+    return os.path.join(default_cache_dir(), 'timetable.idx')
+
+
+def route_transport_types(route_type):
+    """MVG transport type names matching a GTFS route_type"""
+    try:
+        route_type = int(route_type)
+    except ValueError:
+        return ()
+    return ROUTE_TYPES.get(route_type) or ROUTE_TYPE_GROUPS.get(route_type // 100, ())
+
+
+def parse_gtfs_time(value):
+    """Seconds after the service day's reference midnight; GTFS times may pass 24:00:00"""
+    hours, minutes, seconds = value.strip().split(':')
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+
+def parse_gtfs_date(value):
+    return datetime.strptime(value.strip(), '%Y%m%d').date()
+
+
+class GtfsFeed:
+    """Read tables from a GTFS zip or directory as dict rows, streaming large files"""
+
+    def __init__(self, path):
+        # Only the importer reads GTFS; loading a built index at start-up skips zipfile and csv
+        import zipfile
+        self.path = path
+        self._zip = zipfile.ZipFile(path) if zipfile.is_zipfile(path) else None
+
+    def has(self, name):
+        if self._zip:
+            return name in self._zip.namelist()
+        return os.path.exists(os.path.join(self.path, name))
+
+    def rows(self, name):
+        """Rows of one table; missing optional tables yield nothing"""
+        import csv
+        if not self.has(name):
+            return
+        if self._zip:
+            raw = self._zip.open(name)
+        else:
+            raw = open(os.path.join(self.path, name), 'rb')
+        with io.TextIOWrapper(raw, encoding='utf-8-sig', newline='') as f:
+            yield from csv.DictReader(f)
+
+    def close(self):
+        if self._zip:
+            self._zip.close()
+
+
+def service_days(feed, first_day, days):
+    """{service_id: [service dates]} for the days from first_day on, from calendar and calendar_dates"""
+    last_day = first_day + timedelta(days=days - 1)
+    active = {}
+    for row in feed.rows('calendar.txt'):
+        start, end = max(parse_gtfs_date(row['start_date']), first_day), min(parse_gtfs_date(row['end_date']), last_day)
+        weekdays = [row[name] == '1' for name in
+                    ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')]
+        day = start
+        while day <= end:
+            if weekdays[day.weekday()]:
+                active.setdefault(row['service_id'], set()).add(day)
+            day += timedelta(days=1)
+    # Exceptions: 1 adds a date to a service, 2 removes it
+    for row in feed.rows('calendar_dates.txt'):
+        day = parse_gtfs_date(row['date'])
+        if not first_day <= day <= last_day:
+            continue
+        if row['exception_type'].strip() == '1':
+            active.setdefault(row['service_id'], set()).add(day)
+        else:
+            active.get(row['service_id'], set()).discard(day)
+    return {service_id: sorted(dates) for service_id, dates in active.items() if dates}
+
+
+def feed_timezone(feed):
+    """The agency time zone GTFS times are given in, or None for local time"""
+    for row in feed.rows('agency.txt'):
+        name = row.get('agency_timezone', '').strip()
+        if name:
+            try:
+                from zoneinfo import ZoneInfo
+                return ZoneInfo(name)
+            except Exception:
+                # No tz database (e.g. Windows without tzdata): assume the kiosk runs in the feed's zone
+                return None
+    return None
+
+
+def build_timetable(feed_path, watch_list, first_day=None, days=30):
+    """Reduce a GTFS feed to the watched stations and destinations and expand it into a Timetable"""
+    first_day = first_day or date.today() - timedelta(days=1)  # yesterday's service runs past midnight
+    feed = GtfsFeed(feed_path)
+    try:
+        tz = feed_timezone(feed)
+        wanted = {}  # casefolded station name -> watch entries
+        for entry in watch_list:
+            wanted.setdefault(entry.station.casefold(), []).append(entry)
+
+        stops = {}  # stop_id -> watched station name (platforms share their station's name)
+        for row in feed.rows('stops.txt'):
+            entries = wanted.get(row['stop_name'].strip().casefold())
+            if entries:
+                stops[row['stop_id']] = entries[0].station
+
+        routes = {row['route_id']: (row.get('route_short_name') or row.get('route_long_name', ''),
+                                    route_transport_types(row.get('route_type', '')))
+                  for row in feed.rows('routes.txt')}
+        trips = {row['trip_id']: (row['route_id'], row['service_id'], row.get('trip_headsign', '').strip())
+                 for row in feed.rows('trips.txt')}
+        dates = service_days(feed, first_day, days)
+        midnights = {}
+
+        def reference_midnight(day):
+            # GTFS times count from noon minus 12 h, which differs from midnight on DST change days
+            if day not in midnights:
+                noon = datetime(day.year, day.month, day.day, 12, tzinfo=tz)
+                midnights[day] = int(noon.timestamp()) - 12 * 3600
+            return midnights[day]
+
+        patterns = {}  # (line, destination, MVG type name) -> pattern id
+        by_station = {}  # station -> [(epoch, pattern id)]
+        for row in feed.rows('stop_times.txt'):
+            station = stops.get(row['stop_id'])
+            if station is None or row.get('pickup_type', '').strip() == '1':
+                continue
+            # Both times may be empty on stops that are not timepoints; there is nothing to show for those
+            time_text = (row.get('departure_time') or '').strip() or (row.get('arrival_time') or '').strip()
+            if not time_text:
+                continue
+            trip = trips.get(row['trip_id'])
+            if trip is None or trip[1] not in dates:
+                continue
+            line, route_types = routes.get(trip[0], ('', ()))
+            destination = trip[2]
+            seconds = parse_gtfs_time(time_text)
+            for entry in wanted[station.casefold()]:
+                if entry.destinations and destination not in entry.destinations:
+                    continue
+                type_name = next((name for name in entry.transport_types if name in route_types), None)
+                if type_name is None:
+                    continue
+                pattern = patterns.setdefault((line, destination, type_name), len(patterns))
+                times = by_station.setdefault(station, [])
+                for day in dates[trip[1]]:
+                    times.append((reference_midnight(day) + seconds, pattern))
+                break
+    finally:
+        feed.close()
+
+    epochs, pattern_ids, stations = array.array('I'), array.array('H'), {}
+    for station, times in sorted(by_station.items()):
+        times = sorted(set(times))
+        stations[station] = (len(epochs), len(epochs) + len(times))
+        epochs.extend(epoch for epoch, _ in times)
+        pattern_ids.extend(pattern for _, pattern in times)
+    ordered = sorted(patterns, key=patterns.get)
+    header = {
+        'feed': os.path.basename(os.path.normpath(feed_path)),
+        'first_day': first_day.isoformat(),
+        'days': days,
+        'patterns': [list(pattern) for pattern in ordered],
+        'stations': stations,
+    }
+    return Timetable(header, epochs, pattern_ids)
+
+
+class Timetable:
+    """Scheduled departures per station in one epoch-sorted column, with departure patterns by id"""
+
+    def __init__(self, header, epochs, pattern_ids):
+        self.header = header
+        self.patterns = [tuple(pattern) for pattern in header['patterns']]
+        self.stations = {name: tuple(bounds) for name, bounds in header['stations'].items()}
+        self.epochs = epochs
+        self.pattern_ids = pattern_ids
+
+    def __len__(self):
+        return len(self.epochs)
+
+    def covers(self, station):
+        """True if the index has departures for this watched station"""
+        return station in self.stations
+
+    def departures(self, station, after, limit=10, transport_types=None, horizon=6 * 3600):
+        """Next scheduled departures at a station after an epoch, shaped like MvgApi.departures results"""
+        bounds = self.stations.get(station)
+        if bounds is None:
+            return []
+        start, stop = bounds
+        index = bisect.bisect_right(self.epochs, int(after), start, stop)
+        until = after + horizon
+        results = []
+        while index < stop and len(results) < limit and self.epochs[index] <= until:
+            line, destination, type_name = self.patterns[self.pattern_ids[index]]
+            if not transport_types or type_name in transport_types:
+                epoch = self.epochs[index]
+                results.append({
+                    'time': epoch,
+                    'planned': epoch,
+                    'line': line,
+                    'destination': destination,
+                    'type': TRANSPORT_TYPES[type_name][0],
+                    'icon': TRANSPORT_TYPES[type_name][1],
+                    'cancelled': False,
+                    'messages': [],
+                    'scheduled': True,
+                })
+            index += 1
+        return results
+
+    def save(self, path):
+        """Write the index: magic, one JSON header line, then the epoch and pattern columns"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        epochs, pattern_ids = self.epochs, self.pattern_ids
+        if sys.byteorder == 'big':
+            epochs, pattern_ids = array.array('I', epochs), array.array('H', pattern_ids)
+            epochs.byteswap()
+            pattern_ids.byteswap()
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(json.dumps(dict(self.header, count=len(epochs)), ensure_ascii=False).encode('utf-8') + b'\n')
+            f.write(epochs.tobytes())
+            f.write(pattern_ids.tobytes())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read an index written by save"""
+        with open(path, 'rb') as f:
+            if f.readline() != MAGIC:
+                raise ValueError(f"{path} is not a timetable index")
+            header = json.loads(f.readline())
+            epochs, pattern_ids = array.array('I'), array.array('H')
+            epochs.fromfile(f, header['count'])
+            pattern_ids.fromfile(f, header['count'])
+        if sys.byteorder == 'big':
+            epochs.byteswap()
+            pattern_ids.byteswap()
+        return cls(header, epochs, pattern_ids)
+
+
+def timetable_from_args(args):
+    """Timetable for --timetable, or the default index for live runs when one was imported; else None"""
+    path = args.timetable
+    if path is None:
+        if args.replay or args.fake:
+            return None
+        path = default_timetable_path()
+        if not os.path.exists(path):
+            return None
+    return Timetable.load(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import a GTFS feed as an offline timetable for the watch list")
+    parser.add_argument('feed', help="GTFS feed: zip file or unpacked directory")
+    parser.add_argument('--watchlist', metavar='FILE', help="JSON watch list (default: the single default target)")
+    parser.add_argument('--days', type=int, default=30, help="service days to expand, starting yesterday")
+    parser.add_argument('--output', metavar='FILE', default=default_timetable_path(),
+                        help="where to write the index (default: %(default)s)")
+    args = parser.parse_args()
+
+    watch_list = load_watch_list(args.watchlist) if args.watchlist else default_watch_list()
+    timetable = build_timetable(args.feed, watch_list, days=args.days)
+    timetable.save(args.output)
+    print(f"{len(timetable)} departures, {len(timetable.patterns)} line/destination patterns -> {args.output}")
+    for entry in watch_list:
+        if not timetable.covers(entry.station):
+            print(f"No scheduled departures found for {entry.station}; check the station name against stops.txt",
+                  file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
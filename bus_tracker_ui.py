@@ -1,14 +1,116 @@
-import tkinter as tk
-from tkinter import ttk, messagebox, font
-import threading
 import time
-from datetime import datetime, timedelta
-from mvg import MvgApi, TransportType
-import json
+IMPORT_STARTED = time.perf_counter()  # the startup trace counts from here
+import tkinter as tk
+import sys
+import queue
+import argparse
+from datetime import datetime
 import math
+from bus_tracker_core import TrackerEngine, load_watch_list, leave_status
+from bus_tracker_sources import add_source_arguments, source_from_args
+from bus_tracker_timetable import timetable_from_args
+from bus_tracker_board import VirtualBoard
+from bus_tracker_metrics import StartupTrace
+IMPORTS_DONE = time.perf_counter()
+
+# Animation budgets; 'reduced' and 'static' are meant for always-on kiosks on small boards
+PERFORMANCE_PROFILES = {
+    'full': {'frame_ms': 50, 'unfocused_frame_ms': 200, 'animations': True, 'font_pulse': True},
+    'reduced': {'frame_ms': 200, 'unfocused_frame_ms': 1000, 'animations': True, 'font_pulse': False},
+    'static': {'frame_ms': 1000, 'unfocused_frame_ms': 1000, 'animations': False, 'font_pulse': False},
+}
+
+
+class FrameScheduler:
+    """One Tk after-loop that drives every registered animation effect"""
+    
+    def __init__(self, root, frame_ms=50, unfocused_frame_ms=200, metrics=None):
+        self.root = root
+        self.metrics = metrics
+        self.frame_ms = frame_ms
+        self.unfocused_frame_ms = unfocused_frame_ms
+        self.effects = {}  # name -> (callback, every_n_frames)
+        self.frame = 0
+        self.visible = True
+        self.focused = True
+        self._after_id = None
+        self.frame_time_ms = 0.0  # smoothed time spent running effects per frame
+        
+    def register(self, name, callback, every=1):
+        """Add or replace an effect; callback(frame) returning False removes it"""
+        self.effects[name] = (callback, every)
+        self._schedule()
+        
+    def unregister(self, name):
+        """Remove an effect if it is registered"""
+        self.effects.pop(name, None)
+        
+    def is_active(self, name):
+        """True while the named effect is registered"""
+        return name in self.effects
+        
+    def stop(self):
+        """Cancel the pending frame"""
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+            
+    def set_visible(self, visible):
+        """Pause all effects while the window is minimized"""
+        self.visible = visible
+        if visible:
+            self._schedule()
+        else:
+            self.stop()
+            
+    def set_focused(self, focused):
+        """Throttle the frame rate while the window is unfocused"""
+        self.focused = focused
+        
+    def _schedule(self):
+        if self._after_id is None and self.visible and self.effects:
+            delay = self.frame_ms if self.focused else self.unfocused_frame_ms
+            self._after_id = self.root.after(delay, self._run_frame)
+            
+    def _run_frame(self):
+        self._after_id = None
+        self.frame += 1
+        started = time.perf_counter()
+        for name, (callback, every) in list(self.effects.items()):
+            if self.frame % every == 0 and callback(self.frame) is False:
+                self.effects.pop(name, None)
+        elapsed = time.perf_counter() - started
+        if self.metrics:
+            self.metrics.observe('frame', elapsed)
+        self.frame_time_ms += 0.1 * (elapsed * 1000 - self.frame_time_ms)
+        self._schedule()
+
+
+class CpuMonitor:
+    """Process CPU usage (all threads) between successive samples"""
+    
+    def __init__(self):
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        
+    def sample(self):
+        """CPU percent of one core used since the previous sample"""
+        wall, cpu = time.perf_counter(), time.process_time()
+        elapsed = wall - self._wall
+        percent = 100.0 * (cpu - self._cpu) / elapsed if elapsed > 0 else 0.0
+        self._wall, self._cpu = wall, cpu
+        return percent
+
 
 class MunichBusTracker:
-    def __init__(self, root):
+    def __init__(self, root, watch_list=None, profile='full', history=True, predict_confidence=None,
+                 serve=None, feed=None, source=None, clock=None, metrics_address=None, debug_overlay=False,
+                 timetable=None, renderer='widgets', startup_trace=None, print_startup_trace=False,
+                 concurrency='asyncio'):
+        # Import, UI build and first-paint times; main() starts the trace before the imports
+        self.startup_trace = startup_trace or StartupTrace()
+        self.startup_trace.mark('ui_started')
+        self.print_startup_trace = print_startup_trace
         self.root = root
         self.root.title("Munich Bus Tracker - Cyberpunk Edition")
         # Adjusted window size to fit font content better
@@ -67,7 +169,8 @@ class MunichBusTracker:
             'small': ('Helvetica', 28, 'normal'),
             'countdown': ('Helvetica', 72, 'bold'),
             'alert': ('Helvetica', 144, 'bold'),
-            'monospace': ('Courier New', 32, 'normal')
+            'monospace': ('Courier New', 32, 'normal'),
+            'status_bar': ('Courier New', 16, 'normal')
         }
         
         # Simplified icons - removing problematic emojis for better compatibility
@@ -98,24 +201,59 @@ class MunichBusTracker:
         # Enhanced animation variables for cyberpunk effects
         self.animation_frame = 0
         self.last_update = 0
-        self.update_interval = 10  # seconds
-        self.animation_speed = 50  # Faster animations for cyberpunk feel
+        self.update_interval = 10  # seconds - baseline cadence; actual polls adapt to the next leave time
+        self.profile_name = profile
+        self.profile = PERFORMANCE_PROFILES[profile]
+        self.renderer = renderer  # 'widgets' (glow frames and labels) or 'canvas' (see bus_tracker_canvas.py)
+        self.animation_speed = self.profile['frame_ms']  # Faster animations for cyberpunk feel
+        self.unfocused_animation_speed = self.profile['unfocused_frame_ms']  # Throttled while unfocused
+        self.cpu_monitor = CpuMonitor()
+        self.perf_sample_ticks = 2  # refresh the performance readout every N countdown ticks
+        self.tick_count = 0
         self.pulse_intensity = 0.0
         self.color_cycle_position = 0.0
         self.matrix_effect_active = False
         
-        # MVG API setup
-        self.station = None
-        self.mvgapi = None
-        self.target_destination = 'Garching, Forschungszentrum (U)'
-        self.walk_time_minutes = 5
+        # Polling, filtering and leave times live in the Tk-free engine (also used by the headless daemon)
+        self.engine = TrackerEngine(watch_list, history=history and not feed, predict_confidence=predict_confidence,
+                                    update_interval=self.update_interval, source=source, clock=clock,
+                                    timetable=timetable, concurrency=concurrency)
+        # Optionally share snapshots with other displays (serve), or show another tracker's feed instead of polling
+        self.serve_address = serve
+        self.feed_url = feed
+        self.snapshot_hub = None
+        self.snapshot_server = None
+        # Hot-path timings: an optional local /metrics endpoint and an on-screen overlay toggled with F12
+        self.metrics = self.engine.metrics
+        self.startup_trace.attach(self.metrics)
+        self.metrics_address = metrics_address
+        self.metrics_server = None
+        self.debug_overlay = debug_overlay
         
         # Alert state
         self.leave_now_active = False
         
+        # Background fetching; the Tk loop only drains results
+        self.fetch_worker = None
+        self.result_poll_ms = 100
+        
+        # Cached snapshot re-rendered by a cheap local tick
+        self.snapshot = None
+        self.snapshot_departures = ()
+        self.tick_ms = 1000
+        self.stale_grace = 30  # seconds past the expected next fetch before data counts as stale
+        self.showing_saved = False  # True while the snapshot saved by an earlier run is on screen
+        
+        # Last applied widget options, so renders skip no-op Tcl round-trips
+        self.widget_state = {}
+        
         self.setup_ui()
         self.setup_mvg_api()
-        self.start_monitoring()
+        self.startup_trace.mark('ui_built')
+        # Warm start: the last saved departures are on screen before any network work begins
+        self.show_saved_snapshot()
+        # Start network work only once the first frame has been painted
+        self.root.after_idle(self.start_monitoring)
         
     def create_cyberpunk_frame(self, parent, bg_color, border_color, thickness=2):
         """Create a cyberpunk-style frame with neon border effect"""
@@ -148,6 +286,138 @@ class MunichBusTracker:
         main_frame = tk.Frame(self.root, bg=self.colors['bg'])
         main_frame.pack(fill=tk.BOTH, expand=True, padx=15, pady=15)
         
+        if self.renderer == 'canvas':
+            # One canvas for the top panels: text and font changes are item updates, not relayouts
+            from bus_tracker_canvas import CanvasPanels
+            CanvasPanels(self, main_frame).pack(fill=tk.X, pady=(0, 15))
+        else:
+            self.setup_widget_panels(main_frame)
+        
+        # Departures list with matrix-style design
+        if self.renderer == 'canvas':
+            # A highlight border gives the same outline with one frame instead of three
+            departures_frame = departures_outer = tk.Frame(main_frame, bg=self.colors['card_bg'], highlightthickness=3,
+                                                           highlightbackground=self.colors['matrix_green'])
+        else:
+            departures_outer, departures_frame = self.create_neon_glow_frame(
+                main_frame, self.colors['card_bg'], self.colors['matrix_green'], 2
+            )
+        departures_outer.pack(fill=tk.BOTH, expand=True, pady=(0, 15))
+        
+        departures_header = tk.Frame(departures_frame, bg=self.colors['card_bg'])
+        departures_header.pack(pady=(12, 8))
+        
+        # Matrix-style list icon
+        list_icon = tk.Label(departures_header, 
+                            text=self.safe_icon('matrix', '█'), 
+                            font=('Helvetica', 35, 'bold'),
+                            fg=self.colors['matrix_green'], 
+                            bg=self.colors['card_bg'])
+        list_icon.pack(side=tk.LEFT, padx=(0, 10))
+        
+        tk.Label(departures_header, text=">>> DATA STREAM <<<", 
+                font=self.fonts['header'],
+                fg=self.colors['matrix_green'], bg=self.colors['card_bg']).pack(side=tk.LEFT)
+        
+        # Client-side filter by line or destination; the board re-filters on every keystroke
+        self.filter_entry = tk.Entry(departures_header, font=self.fonts['small'], width=12,
+                                     bg=self.colors['darker'], fg=self.colors['matrix_green'],
+                                     insertbackground=self.colors['matrix_green'], relief=tk.FLAT)
+        self.filter_entry.pack(side=tk.LEFT, padx=(20, 0))
+        self.filter_entry.bind('<KeyRelease>', lambda event: self.departures_board.set_filter(self.filter_entry.get()))
+        
+        # Enhanced matrix-style departures list
+        list_container = tk.Frame(departures_frame, bg=self.colors['darker'],
+                                 relief=tk.SUNKEN, bd=3)
+        list_container.pack(fill=tk.BOTH, expand=True, padx=12, pady=(0, 12))
+        
+        # Cyberpunk scrollbar styling
+        scrollbar = tk.Scrollbar(list_container, bg=self.colors['card_bg'], 
+                                troughcolor=self.colors['darker'],
+                                activebackground=self.colors['primary'])
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        self.departures_listbox = tk.Listbox(list_container, 
+                                            font=self.fonts['small'],
+                                            bg=self.colors['darker'], 
+                                            fg=self.colors['matrix_green'],
+                                            selectbackground=self.colors['primary'],
+                                            selectforeground=self.colors['bg'],
+                                            borderwidth=0, 
+                                            highlightthickness=0,
+                                            activestyle='none')
+        self.departures_listbox.pack(fill=tk.BOTH, expand=True, padx=4, pady=4)
+        # Only the rows in view exist in the Listbox; the board drives the scrollbar itself
+        self.departures_board = VirtualBoard(self.departures_listbox, scrollbar, self.format_departure_row,
+                                             self.fonts['small'])
+        scrollbar.config(command=self.departures_board.yview)
+        for sequence in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            self.departures_listbox.bind(sequence, self.departures_board.on_mousewheel)
+        self.departures_listbox.bind('<Configure>', lambda event: self.departures_board.render(self.departures_board.now))
+        
+        # Enhanced cyberpunk control buttons
+        button_frame = tk.Frame(main_frame, bg=self.colors['bg'])
+        button_frame.pack(fill=tk.X)
+        
+        # Refresh button with electric glow
+        refresh_outer = tk.Frame(button_frame, bg=self.colors['primary'], 
+                               relief=tk.RAISED, bd=3)
+        refresh_outer.pack(side=tk.LEFT, padx=(0, 10))
+        
+        self.refresh_button = tk.Button(refresh_outer, 
+                                       text=f"{self.safe_icon('refresh', '⟲')} REFRESH", 
+                                       font=self.fonts['body'],
+                                       bg=self.colors['primary'], 
+                                       fg=self.colors['bg'],
+                                       activebackground=self.colors['primary_light'], 
+                                       activeforeground=self.colors['bg'],
+                                       borderwidth=0,
+                                       padx=20, pady=12,
+                                       command=self.manual_refresh)
+        self.refresh_button.pack(fill=tk.BOTH, expand=True)
+        
+        # Exit button with danger glow
+        exit_outer = tk.Frame(button_frame, bg=self.colors['danger'], 
+                            relief=tk.RAISED, bd=3)
+        exit_outer.pack(side=tk.RIGHT)
+        
+        self.exit_button = tk.Button(exit_outer, 
+                                    text=f"{self.safe_icon('cross', '✗')} EXIT", 
+                                    font=self.fonts['body'],
+                                    bg=self.colors['danger'], 
+                                    fg=self.colors['text'],
+                                    activebackground=self.colors['danger_light'], 
+                                    activeforeground=self.colors['text'],
+                                    borderwidth=0,
+                                    padx=20, pady=12,
+                                    command=self.shutdown)
+        self.exit_button.pack(fill=tk.BOTH, expand=True)
+        
+        # Performance readout for checking the frame budget on each device
+        self.perf_label = tk.Label(main_frame, text=f"PROFILE {self.profile_name.upper()}",
+                                   font=self.fonts['status_bar'],
+                                   fg=self.colors['text_tertiary'], bg=self.colors['bg'], anchor=tk.W)
+        self.perf_label.pack(fill=tk.X, pady=(10, 0))
+        
+        # Span percentiles and counters, hidden until toggled
+        self.debug_label = tk.Label(main_frame, text="", font=self.fonts['status_bar'], justify=tk.LEFT,
+                                    fg=self.colors['warning'], bg=self.colors['bg'], anchor=tk.W)
+        if self.debug_overlay:
+            self.debug_label.pack(fill=tk.X)
+        self.root.bind('<F12>', self.toggle_debug_overlay, add='+')
+        
+        # Start enhanced cyberpunk animation on a single frame loop
+        self.frame_scheduler = FrameScheduler(self.root, self.animation_speed, self.unfocused_animation_speed,
+                                              self.metrics)
+        if self.profile['animations']:
+            self.frame_scheduler.register('ambient', self.animate_cyberpunk_ui)
+        self.root.bind('<Map>', self.on_window_map, add='+')
+        self.root.bind('<Unmap>', self.on_window_unmap, add='+')
+        self.root.bind('<FocusIn>', self.on_focus_change, add='+')
+        self.root.bind('<FocusOut>', self.on_focus_change, add='+')
+    
+    def setup_widget_panels(self, main_frame):
+        """Title, status, target, LEAVE NOW and countdown panels as nested glow frames and labels"""
         # Title section with neon glow effect
         title_outer, title_frame = self.create_neon_glow_frame(
             main_frame, self.colors['card_bg'], self.colors['primary'], 3
@@ -221,7 +491,7 @@ class MunichBusTracker:
                 font=self.fonts['subheader'],
                 fg=self.colors['text'], bg=self.colors['card_bg']).pack(side=tk.LEFT)
         
-        tk.Label(dest_frame, text=self.target_destination, 
+        tk.Label(dest_frame, text=self.describe_targets(), 
                 font=self.fonts['header'],
                 fg=self.colors['laser_red'], bg=self.colors['card_bg']).pack(pady=(0, 12))
         
@@ -280,274 +550,331 @@ class MunichBusTracker:
                                         font=self.fonts['large'],
                                         fg=self.colors['warning'], bg=self.colors['card_bg'])
         self.leave_time_label.pack(side=tk.LEFT)
-        
-        # Departures list with matrix-style design
-        departures_outer, departures_frame = self.create_neon_glow_frame(
-            main_frame, self.colors['card_bg'], self.colors['matrix_green'], 2
-        )
-        departures_outer.pack(fill=tk.BOTH, expand=True, pady=(0, 15))
-        
-        departures_header = tk.Frame(departures_frame, bg=self.colors['card_bg'])
-        departures_header.pack(pady=(12, 8))
-        
-        # Matrix-style list icon
-        list_icon = tk.Label(departures_header, 
-                            text=self.safe_icon('matrix', '█'), 
-                            font=('Helvetica', 35, 'bold'),
-                            fg=self.colors['matrix_green'], 
-                            bg=self.colors['card_bg'])
-        list_icon.pack(side=tk.LEFT, padx=(0, 10))
-        
-        tk.Label(departures_header, text=">>> DATA STREAM <<<", 
-                font=self.fonts['header'],
-                fg=self.colors['matrix_green'], bg=self.colors['card_bg']).pack(side=tk.LEFT)
-        
-        # Enhanced matrix-style departures list
-        list_container = tk.Frame(departures_frame, bg=self.colors['darker'],
-                                 relief=tk.SUNKEN, bd=3)
-        list_container.pack(fill=tk.BOTH, expand=True, padx=12, pady=(0, 12))
-        
-        # Cyberpunk scrollbar styling
-        scrollbar = tk.Scrollbar(list_container, bg=self.colors['card_bg'], 
-                                troughcolor=self.colors['darker'],
-                                activebackground=self.colors['primary'])
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        self.departures_listbox = tk.Listbox(list_container, 
-                                            font=self.fonts['small'],
-                                            bg=self.colors['darker'], 
-                                            fg=self.colors['matrix_green'],
-                                            selectbackground=self.colors['primary'],
-                                            selectforeground=self.colors['bg'],
-                                            borderwidth=0, 
-                                            highlightthickness=0,
-                                            activestyle='none',
-                                            yscrollcommand=scrollbar.set)
-        scrollbar.config(command=self.departures_listbox.yview)
-        self.departures_listbox.pack(fill=tk.BOTH, expand=True, padx=4, pady=4)
-        
-        # Enhanced cyberpunk control buttons
-        button_frame = tk.Frame(main_frame, bg=self.colors['bg'])
-        button_frame.pack(fill=tk.X)
-        
-        # Refresh button with electric glow
-        refresh_outer = tk.Frame(button_frame, bg=self.colors['primary'], 
-                               relief=tk.RAISED, bd=3)
-        refresh_outer.pack(side=tk.LEFT, padx=(0, 10))
-        
-        self.refresh_button = tk.Button(refresh_outer, 
-                                       text=f"{self.safe_icon('refresh', '⟲')} REFRESH", 
-                                       font=self.fonts['body'],
-                                       bg=self.colors['primary'], 
-                                       fg=self.colors['bg'],
-                                       activebackground=self.colors['primary_light'], 
-                                       activeforeground=self.colors['bg'],
-                                       borderwidth=0,
-                                       padx=20, pady=12,
-                                       command=self.manual_refresh)
-        self.refresh_button.pack(fill=tk.BOTH, expand=True)
-        
-        # Exit button with danger glow
-        exit_outer = tk.Frame(button_frame, bg=self.colors['danger'], 
-                            relief=tk.RAISED, bd=3)
-        exit_outer.pack(side=tk.RIGHT)
-        
-        self.exit_button = tk.Button(exit_outer, 
-                                    text=f"{self.safe_icon('cross', '✗')} EXIT", 
-                                    font=self.fonts['body'],
-                                    bg=self.colors['danger'], 
-                                    fg=self.colors['text'],
-                                    activebackground=self.colors['danger_light'], 
-                                    activeforeground=self.colors['text'],
-                                    borderwidth=0,
-                                    padx=20, pady=12,
-                                    command=self.root.quit)
-        self.exit_button.pack(fill=tk.BOTH, expand=True)
-        
-        # Start enhanced cyberpunk animation
-        self.animate_cyberpunk_ui()
+    
+    def on_window_map(self, event):
+        """Resume animations when the window is restored"""
+        if event.widget is self.root:
+            self.frame_scheduler.set_visible(True)
+    
+    def on_window_unmap(self, event):
+        """Pause animations while the window is minimized"""
+        if event.widget is self.root:
+            self.frame_scheduler.set_visible(False)
+    
+    def on_focus_change(self, event):
+        """Throttle animations once focus has settled outside the application"""
+        # Focus moving between our own widgets also fires FocusOut, so check after it settles
+        self.root.after_idle(lambda: self.frame_scheduler.set_focused(self.root.focus_displayof() is not None))
+    
+    def toggle_debug_overlay(self, event=None):
+        """Show or hide the timing overlay"""
+        self.debug_overlay = not self.debug_overlay
+        if self.debug_overlay:
+            self.debug_label.pack(fill=tk.X)
+            self.render_debug_overlay()
+        else:
+            self.debug_label.pack_forget()
+    
+    def describe_targets(self):
+        """Short label for the watched destinations"""
+        destinations = set()
+        watch_list = self.engine.watch_list
+        for entry in watch_list:
+            destinations.update(entry.destinations or ['ALL DESTINATIONS'])
+        if len(destinations) == 1:
+            return destinations.pop()
+        return f"{len(destinations)} TARGETS @ {len(set(e.station for e in watch_list))} STATIONS"
+    
+    def set_widget(self, widget, **options):
+        """Configure only the widget options whose value actually changed"""
+        changed = {}
+        for option, value in options.items():
+            key = (widget, option)
+            if self.widget_state.get(key) != value:
+                self.widget_state[key] = value
+                changed[option] = value
+        if changed:
+            widget.config(**changed)
     
     def setup_mvg_api(self):
-        """Initialize MVG API connection with cyberpunk status messages"""
-        try:
+        """Load stations from the local cache; unknown stations are resolved in the background"""
+        if self.feed_url:
+            self.status_label.config(text=f">>> LINKING TO FEED {self.feed_url} <<<")
+            self.status_icon.config(text=self.safe_icon('electric', '⚡'))
+        elif self.engine.load_cached_stations():
+            self.status_label.config(text=">>> NEURAL LINK ESTABLISHED <<<", fg=self.colors['success'])
+            self.status_icon.config(text=self.safe_icon('check', '✓'), fg=self.colors['success'])
+        else:
             self.status_label.config(text=">>> ESTABLISHING NEURAL LINK <<<")
             self.status_icon.config(text=self.safe_icon('electric', '⚡'))
-            self.station = MvgApi.station('Parkring Süd')
-            if self.station:
-                self.mvgapi = MvgApi(self.station['id'])
-                self.status_label.config(text=">>> NEURAL LINK ESTABLISHED <<<", fg=self.colors['success'])
-                self.status_icon.config(text=self.safe_icon('check', '✓'), fg=self.colors['success'])
-            else:
-                self.status_label.config(text=">>> STATION NOT FOUND <<<", fg=self.colors['danger'])
-                self.status_icon.config(text=self.safe_icon('cross', '✗'), fg=self.colors['danger'])
-        except Exception as e:
-            self.status_label.config(text=f">>> CONNECTION ERROR: {str(e)[:20]}... <<<", fg=self.colors['danger'])
-            self.status_icon.config(text=self.safe_icon('cross', '✗'), fg=self.colors['danger'])
-    
-    def get_departures(self):
-        """Fetch departures from MVG API with optimization"""
-        if not self.mvgapi:
-            return []
-        
+    
+    def poll_fetch_results(self):
+        """Drain finished fetches from the worker queue and render the newest one"""
+        snapshot = None
         try:
-            # Fetch departures efficiently
-            departures = self.mvgapi.departures(
-                limit=10,
-                offset=0,
-                transport_types=[TransportType.REGIONAL_BUS]
-            )
-            
-            # Filter for target destination
-            filtered_departures = [
-                dep for dep in departures 
-                if dep['destination'] == self.target_destination
-            ]
-            
-            return filtered_departures
-            
-        except Exception as e:
-            self.status_label.config(text=f">>> DATA FETCH ERROR: {str(e)[:15]}... <<<", fg=self.colors['danger'])
-            self.status_icon.config(text=self.safe_icon('cross', '✗'), fg=self.colors['danger'])
-            return []
-    
-    def format_time(self, timestamp):
-        """Convert timestamp to readable time"""
-        return datetime.fromtimestamp(timestamp).strftime('%H:%M')
-    
-    def calculate_leave_time(self, departure_timestamp):
-        """Calculate when to leave office"""
-        departure_time = datetime.fromtimestamp(departure_timestamp)
-        leave_time = departure_time - timedelta(minutes=self.walk_time_minutes)
-        return leave_time
-    
-    def update_departures(self):
-        """Update the departures display with cyberpunk styling"""
-        departures = self.get_departures()
-        
-        # Clear previous entries
-        self.departures_listbox.delete(0, tk.END)
-        
-        if not departures:
-            self.departures_listbox.insert(tk.END, f"{self.safe_icon('warning', '⚠')} >>> NO DATA STREAMS TO TARGET <<<")
-            self.next_bus_label.config(text=">>> NO UPCOMING TRANSPORTS <<<")
-            self.countdown_label.config(text="--:--")
-            self.leave_time_label.config(text="")
-            self.leave_time_icon.config(text=self.safe_icon('warning', '⚠'), fg=self.colors['warning'])
-            return
-        
-        current_time = datetime.now()
+            while True:
+                snapshot = self.fetch_worker.results.get_nowait()
+        except queue.Empty:
+            pass
         
-        # Process next departure for countdown
-        next_departure = departures[0]
-        departure_time = datetime.fromtimestamp(next_departure['time'])
-        leave_time = self.calculate_leave_time(next_departure['time'])
+        if snapshot is not None:
+            if self.snapshot_hub:
+                self.snapshot_hub.publish(snapshot, self.fetch_worker.next_delay)
+            self.update_departures(snapshot)
         
-        time_until_departure = departure_time - current_time
-        time_until_leave = leave_time - current_time
+        self.root.after(self.result_poll_ms, self.poll_fetch_results)
+    
+    def show_saved_snapshot(self):
+        """Render the snapshot saved by the last successful fetch, marked stale until a live one replaces it"""
+        if self.feed_url:
+            return
+        snapshot = self.engine.load_last_snapshot()
+        if snapshot is not None:
+            self.update_departures(snapshot, live=False)
+    
+    def update_departures(self, snapshot, live=True):
+        """Cache a freshly fetched snapshot and render it"""
+        self.snapshot = snapshot
+        # A failed fetch keeps the last good departures; they age into the stale state
+        if snapshot.departures or not snapshot.error:
+            self.snapshot_departures = snapshot.departures
+            self.last_update = snapshot.fetched_at
+            self.showing_saved = not live
+        self.render_countdowns()
+        self.trace_first_paint()
+    
+    def trace_first_paint(self):
+        """Mark the first paint with departures on screen, and the first one showing live data"""
+        trace = self.startup_trace
+        if not self.last_update or 'first_live' in trace.marks:
+            return
+        # Let Tk finish geometry and redraws so the mark is what the screen actually shows
+        self.root.update_idletasks()
+        trace.mark('first_paint')
+        if not self.showing_saved:
+            trace.mark('first_live')
+            if self.print_startup_trace:
+                print(trace.report(), file=sys.stderr)
+    
+    def tick(self):
+        """1 Hz local countdown: re-render from cached timestamps without fetching"""
+        if self.snapshot is not None:
+            self.render_countdowns()
+        self.tick_count += 1
+        if self.tick_count % self.perf_sample_ticks == 0:
+            self.render_performance()
+            if self.debug_overlay:
+                self.render_debug_overlay()
+        self.root.after(self.tick_ms, self.tick)
+    
+    def render_performance(self):
+        """Show profile, effective frame rate, frame time and process CPU% in the status bar"""
+        scheduler = self.frame_scheduler
+        frame_ms = scheduler.frame_ms if scheduler.focused else scheduler.unfocused_frame_ms
+        fps = 0 if not (scheduler.effects and scheduler.visible) else 1000 // frame_ms
+        text = (f"PROFILE {self.profile_name.upper()} | {fps} FPS | "
+                f"FRAME {scheduler.frame_time_ms:.2f} MS | CPU {self.cpu_monitor.sample():.1f}%")
+        latency = self.engine.departures_client.latency_summary() if self.engine.departures_client else None
+        if latency:
+            text += (f" | HTTP CONNECT {latency['connect_ms']:.0f} MS + TRANSFER {latency['transfer_ms']:.0f} MS"
+                     f" | REUSE {latency['reuse_rate']:.0%}")
+        cache = self.engine.departure_cache.stats()
+        text += f" | CACHE {cache['hits'] + cache['coalesced']}/{cache['hits'] + cache['coalesced'] + cache['misses']} HIT"
+        if self.engine.poll_scheduler:
+            polls = self.engine.poll_scheduler.stats()
+            text += f" | POLLS {polls['polls']} ({polls['requests_saved']} SAVED)"
+        if self.snapshot is not None:
+            pages_fetched, pages_reused = self.snapshot.pages
+            text += f" | PAGES {pages_fetched} FETCHED + {pages_reused} REUSED"
+        self.set_widget(self.perf_label, text=text)
+    
+    def render_debug_overlay(self):
+        """Span counts, p50/p95 times and counters from the metrics registry"""
+        spans = "  ".join(f"{name.upper()} {count}x P50 {p50:.2f} P95 {p95:.2f} MS"
+                          for name, (count, p50, p95) in self.metrics.summary().items())
+        counters = "  ".join(f"{name.upper()}{'[' + label[1].upper() + ']' if label else ''} {value}"
+                             for (name, label), value in sorted(self.metrics.counter_values().items(),
+                                                                key=lambda item: (item[0][0], item[0][1] or ())))
+        self.set_widget(self.debug_label, text=f"{spans or 'NO SPANS YET'}\n{counters}")
+    
+    def is_stale(self, now):
+        """True when the cached snapshot is older than the next expected fetch allows"""
+        expected = self.fetch_worker.next_delay if self.fetch_worker and self.fetch_worker.next_delay else self.engine.update_interval
+        return now - self.last_update > expected + self.stale_grace
+    
+    def render_countdowns(self):
+        """Recompute countdowns, leave status and alerts from the cached snapshot"""
+        with self.metrics.span('render'):
+            self._render_countdowns()
+    
+    def _render_countdowns(self):
+        departures = self.snapshot_departures
+        now = self.engine.clock.time()
+        self.render_status(now)
+        
+        # Stops at the first departure still to come; boards can hold thousands
+        next_departure = next((dep for dep in departures if dep.time > now), None)
+        if next_departure is None:
+            self.departures_board.show_message('empty', f"{self.safe_icon('warning', '⚠')} >>> NO DATA STREAMS TO TARGET <<<")
+            self.set_widget(self.next_bus_label, text=">>> NO UPCOMING TRANSPORTS <<<")
+            self.set_widget(self.countdown_label, text="--:--")
+            self.set_widget(self.leave_time_label, text="")
+            self.set_widget(self.leave_time_icon, text=self.safe_icon('warning', '⚠'), fg=self.colors['warning'])
+            self.hide_leave_now_alert()
+            return
         
-        minutes_until_departure = max(0, int(time_until_departure.total_seconds() / 60))
-        minutes_until_leave = max(0, int(time_until_leave.total_seconds() / 60))
+        # Process next departure that has not left yet for the countdown
+        state, minutes_until_departure, minutes_until_leave = leave_status(next_departure, now)
         
         # Update next bus info with cyberpunk styling
-        self.next_bus_label.config(text=f">>> TRANSPORT {next_departure['line']} → {next_departure['destination'][:30]}... <<<")
+        if self.engine.multi_station:
+            self.set_widget(self.next_bus_label, text=f">>> {next_departure.station[:20]}: {next_departure.line} → {next_departure.destination[:24]}... <<<")
+        else:
+            self.set_widget(self.next_bus_label, text=f">>> TRANSPORT {next_departure.line} → {next_departure.destination[:30]}... <<<")
         
         # Update countdown display
         if minutes_until_departure <= 0:
-            self.countdown_label.config(text=">>> DEPARTED <<<", fg=self.colors['danger'])
+            self.set_widget(self.countdown_label, text=">>> DEPARTING <<<", fg=self.colors['danger'])
         else:
-            self.countdown_label.config(text=f">>> {minutes_until_departure} MIN REMAINING <<<", 
+            self.set_widget(self.countdown_label, text=f">>> {minutes_until_departure} MIN REMAINING <<<", 
                                        fg=self.colors['primary'])
         
         # Update leave time display with cyberpunk alerts
-        if minutes_until_leave <= 0 and minutes_until_departure > 0:
+        if state == 'leave_now':
             # Enhanced LEAVE NOW alert
-            alert_text = f">>> LEAVE NOW! LEAVE NOW! <<<\n>>> TRANSPORT {next_departure['line']} IN {minutes_until_departure} MIN <<<"
+            alert_text = f">>> LEAVE NOW! LEAVE NOW! <<<\n>>> TRANSPORT {next_departure.line} IN {minutes_until_departure} MIN <<<"
             self.show_leave_now_alert(alert_text)
-            self.leave_time_label.config(text=f">>> LEAVE NOW! LEAVE NOW! <<<", fg=self.colors['danger'])
-            self.leave_time_icon.config(text=self.safe_icon('alert', '⚡'), fg=self.colors['danger'])
-        elif minutes_until_leave <= 2:
-            self.leave_time_label.config(text=f">>> PREPARE TO LEAVE IN {minutes_until_leave} MIN <<<", 
+            self.set_widget(self.leave_time_label, text=">>> LEAVE NOW! LEAVE NOW! <<<", fg=self.colors['danger'])
+            self.set_widget(self.leave_time_icon, text=self.safe_icon('alert', '⚡'), fg=self.colors['danger'])
+        elif state == 'prepare':
+            self.set_widget(self.leave_time_label, text=f">>> PREPARE TO LEAVE IN {minutes_until_leave} MIN <<<", 
                                         fg=self.colors['warning'])
-            self.leave_time_icon.config(text=self.safe_icon('warning', '⚠'), fg=self.colors['warning'])
+            self.set_widget(self.leave_time_icon, text=self.safe_icon('warning', '⚠'), fg=self.colors['warning'])
+            self.hide_leave_now_alert()
+        elif next_departure.leave_predicted:
+            self.set_widget(self.leave_time_label, text=f">>> LEAVE AT {next_departure.leave_clock} "
+                                                       f"FOR {next_departure.leave_confidence:.0%} CATCH <<<", 
+                                        fg=self.colors['success'])
+            self.set_widget(self.leave_time_icon, text=self.safe_icon('check', '✓'), fg=self.colors['success'])
             self.hide_leave_now_alert()
         else:
-            self.leave_time_label.config(text=f">>> DEPARTURE IN {minutes_until_leave} MINUTES <<<", 
+            self.set_widget(self.leave_time_label, text=f">>> DEPARTURE IN {minutes_until_leave} MINUTES <<<", 
                                         fg=self.colors['success'])
-            self.leave_time_icon.config(text=self.safe_icon('check', '✓'), fg=self.colors['success'])
+            self.set_widget(self.leave_time_icon, text=self.safe_icon('check', '✓'), fg=self.colors['success'])
             self.hide_leave_now_alert()
         
-        # Update departures list with cyberpunk matrix-style formatting
-        for i, dep in enumerate(departures):
-            departure_time = datetime.fromtimestamp(dep['time'])
-            leave_time = self.calculate_leave_time(dep['time'])
-            
-            time_until_departure = departure_time - current_time
-            time_until_leave = leave_time - current_time
-            
-            minutes_until_departure = max(0, int(time_until_departure.total_seconds() / 60))
-            minutes_until_leave = max(0, int(time_until_leave.total_seconds() / 60))
-            
-            # Cyberpunk status indicators
-            if minutes_until_departure <= 0:
-                status_icon = self.safe_icon('status_red', '●')
-                status = "DEPARTED"
-            elif minutes_until_leave <= 0:
-                status_icon = self.safe_icon('alert', '⚡')
-                status = "LEAVE NOW!"
-            elif minutes_until_leave <= 2:
-                status_icon = self.safe_icon('warning', '⚠')
-                status = f"PREP {minutes_until_leave}MIN"
-            elif minutes_until_leave <= 5:
-                status_icon = self.safe_icon('status_yellow', '●')
-                status = f"WAIT {minutes_until_leave}MIN"
-            else:
-                status_icon = self.safe_icon('status_green', '●')
-                status = f"STANDBY {minutes_until_leave}MIN"
-            
-            display_text = f"{status_icon} LINE{dep['line']} | {self.format_time(dep['time'])} | {status} | ETA-{minutes_until_departure}MIN"
-            
-            self.departures_listbox.insert(tk.END, display_text)
+        # Update departures list; only the rows in view are formatted
+        self.departures_board.set_departures(departures)
+        self.departures_board.render(now)
+    
+    def format_departure_row(self, dep, now):
+        """(trip key, text) of one departures list row with cyberpunk matrix-style formatting"""
+        state, minutes_until_departure, minutes_until_leave = leave_status(dep, now)
+        
+        # Cyberpunk status indicators
+        if state == 'departed':
+            status_icon = self.safe_icon('status_red', '●')
+            status = "DEPARTED"
+        elif state == 'leave_now':
+            status_icon = self.safe_icon('alert', '⚡')
+            status = "LEAVE NOW!"
+        elif state == 'prepare':
+            status_icon = self.safe_icon('warning', '⚠')
+            status = f"PREP {minutes_until_leave}MIN"
+        elif state == 'wait':
+            status_icon = self.safe_icon('status_yellow', '●')
+            status = f"WAIT {minutes_until_leave}MIN"
+        else:
+            status_icon = self.safe_icon('status_green', '●')
+            status = f"STANDBY {minutes_until_leave}MIN"
+        
+        # Clock strings and trip keys were computed once when the snapshot was built
+        display_text = f"{status_icon} LINE{dep.line} | {dep.clock} | {status} | ETA-{minutes_until_departure}MIN"
+        if self.engine.multi_station:
+            display_text = f"{status_icon} {dep.station[:16]} | LINE{dep.line} → {dep.destination[:16]} | {dep.clock} | {status}"
+        elif self.engine.multi_destination:
+            display_text = f"{status_icon} LINE{dep.line} → {dep.destination[:20]} | {dep.clock} | {status} | ETA-{minutes_until_departure}MIN"
+        if dep.scheduled:
+            display_text += " | SCHEDULED"
+        return dep.key, display_text
+    
+    
+    def render_status(self, now):
+        """Show sync time, fetch errors or the stale marker in the status panel"""
+        snapshot = self.snapshot
+        failed = snapshot.error and not snapshot.departures
+        
+        if not self.last_update:
+            if failed:
+                self.set_widget(self.status_label, text=f">>> DATA FETCH ERROR: {snapshot.error[:15]}... <<<", fg=self.colors['danger'])
+                self.set_widget(self.status_icon, text=self.safe_icon('cross', '✗'), fg=self.colors['danger'])
+            return
         
         # Update status with cyberpunk timestamp
-        self.status_label.config(text=f">>> LAST SYNC: {current_time.strftime('%H:%M:%S')} <<<", 
-                                fg=self.colors['success'])
-        self.status_icon.config(text=self.safe_icon('check', '✓'), fg=self.colors['success'])
+        last_sync = datetime.fromtimestamp(self.last_update).strftime('%H:%M:%S')
+        scheduled = sum(1 for dep in self.snapshot_departures if dep.scheduled)
+        if self.showing_saved:
+            # Saved by an earlier run; shown only until the first live fetch succeeds
+            age_minutes = int((now - self.last_update) / 60)
+            problem = f"FETCH ERROR: {snapshot.error[:15]}" if failed else "REFRESHING"
+            self.set_widget(self.status_label, text=f">>> STALE: SAVED {last_sync} ({age_minutes} MIN AGO) | {problem} <<<",
+                                    fg=self.colors['warning'])
+            self.set_widget(self.status_icon, text=self.safe_icon('refresh', '⟲'), fg=self.colors['warning'])
+        elif self.is_stale(now):
+            age_minutes = int((now - self.last_update) / 60)
+            self.set_widget(self.status_label, text=f">>> DATA STALE: LAST SYNC {last_sync} ({age_minutes} MIN AGO) <<<", 
+                                    fg=self.colors['warning'])
+            self.set_widget(self.status_icon, text=self.safe_icon('warning', '⚠'), fg=self.colors['warning'])
+        elif scheduled:
+            # The offline timetable stands in for MVG; never let it pass for live data
+            self.set_widget(self.status_label, text=f">>> SCHEDULED, NOT LIVE: MVG UNREACHABLE ({last_sync}) <<<",
+                                    fg=self.colors['warning'])
+            self.set_widget(self.status_icon, text=self.safe_icon('clock', '⏰'), fg=self.colors['warning'])
+        elif snapshot.error:
+            problem = f"FETCH ERROR: {snapshot.error[:15]}" if failed else snapshot.error[:20]
+            self.set_widget(self.status_label, text=f">>> LAST SYNC: {last_sync} | {problem} <<<", 
+                                    fg=self.colors['warning'])
+            self.set_widget(self.status_icon, text=self.safe_icon('warning', '⚠'), fg=self.colors['warning'])
+        else:
+            self.set_widget(self.status_label, text=f">>> LAST SYNC: {last_sync} <<<", 
+                                    fg=self.colors['success'])
+            self.set_widget(self.status_icon, text=self.safe_icon('check', '✓'), fg=self.colors['success'])
     
     def show_leave_now_alert(self, message):
         """Show prominent cyberpunk leave now alert"""
+        self.set_widget(self.leave_now_label, text=message)
         if not self.leave_now_active:
             self.leave_now_active = True
-            self.leave_now_label.config(text=message)
             self.leave_now_frame.pack(fill=tk.X, padx=15, pady=(0, 15))
-            # Start cyberpunk flashing effect
-            self.flash_cyberpunk_alert()
+            # Start cyberpunk flashing effect; re-registering replaces it, so flashes never stack
+            if self.profile['animations']:
+                self.frame_scheduler.register('leave_now_flash', self.flash_cyberpunk_alert,
+                                              every=max(1, 200 // self.animation_speed))
     
     def hide_leave_now_alert(self):
         """Hide the leave now alert"""
         if self.leave_now_active:
             self.leave_now_active = False
+            self.frame_scheduler.unregister('leave_now_flash')
             self.leave_now_frame.pack_forget()
     
-    def flash_cyberpunk_alert(self):
+    def flash_cyberpunk_alert(self, frame):
         """Flash the alert with cyberpunk color cycling"""
         if not self.leave_now_active:
-            return
+            return False
             
         # Cycle through cyberpunk colors
         colors = [self.colors['danger'], self.colors['laser_red'], 
                  self.colors['warning'], self.colors['electric_purple']]
-        color_index = (self.animation_frame // 8) % len(colors)
+        color_index = (frame // 8) % len(colors)
         current_color = colors[color_index]
         
-        self.leave_now_frame.config(bg=current_color)
-        self.leave_now_label.config(bg=current_color)
-        
-        # Continue flashing
-        self.root.after(200, self.flash_cyberpunk_alert)
+        self.set_widget(self.leave_now_frame, bg=current_color)
+        self.set_widget(self.leave_now_label, bg=current_color)
     
-    def animate_cyberpunk_ui(self):
+    def animate_cyberpunk_ui(self, frame):
         """Enhanced cyberpunk UI animation with multiple effects"""
-        self.animation_frame = (self.animation_frame + 1) % 360
+        self.animation_frame = frame % 360
         self.color_cycle_position = (self.color_cycle_position + 0.02) % 1.0
         
         # Enhanced pulsing effect for title
@@ -566,7 +893,7 @@ class MunichBusTracker:
                     title_color = self.colors['secondary']
                 else:
                     title_color = self.colors['electric_purple']
-                self.title_label.config(fg=title_color)
+                self.set_widget(self.title_label, fg=title_color)
             
             # Animate cyberpunk bus icon with rapid color cycling
             if hasattr(self, 'bus_icon_label'):
@@ -582,7 +909,7 @@ class MunichBusTracker:
                     icon_color = self.colors['electric_purple']
                 else:
                     icon_color = self.colors['highlight']
-                self.bus_icon_label.config(fg=icon_color)
+                self.set_widget(self.bus_icon_label, fg=icon_color)
         
         # Animate subtitle with matrix-style effect
         if self.animation_frame % 20 == 0 and hasattr(self, 'subtitle_label'):
@@ -594,71 +921,131 @@ class MunichBusTracker:
                 ">>> DIGITAL DEPARTURE SYSTEM <<<"
             ]
             message_index = (self.animation_frame // 20) % len(messages)
-            self.subtitle_label.config(text=messages[message_index])
+            self.set_widget(self.subtitle_label, text=messages[message_index])
         
-        # Animate status icon with electric pulse
-        if self.animation_frame % 15 == 0 and hasattr(self, 'status_icon'):
+        # Animate status icon with electric pulse (font changes force a relayout, so profiles can skip it)
+        if self.animation_frame % 15 == 0 and self.profile['font_pulse'] and hasattr(self, 'status_icon'):
             base_size = 28
             pulse_size = base_size + int(4 * self.pulse_intensity)
-            self.status_icon.config(font=('Helvetica', pulse_size, 'bold'))
+            self.set_widget(self.status_icon, font=('Helvetica', pulse_size, 'bold'))
         
         # Matrix-style effect for departures list background
         if self.animation_frame % 60 == 0 and hasattr(self, 'departures_listbox'):
             # Subtle background color shifting
             bg_colors = [self.colors['darker'], self.colors['dark'], self.colors['card_bg']]
             bg_index = (self.animation_frame // 60) % len(bg_colors)
-            self.departures_listbox.config(bg=bg_colors[bg_index])
+            self.set_widget(self.departures_listbox, bg=bg_colors[bg_index])
         
-        # Animate button glow effects
-        if self.animation_frame % 10 == 0:
+        # Animate button glow effects (paused while refresh feedback plays)
+        if self.animation_frame % 10 == 0 and not self.frame_scheduler.is_active('refresh_feedback'):
             if hasattr(self, 'refresh_button'):
                 # Pulse the refresh button
                 glow_colors = [self.colors['primary'], self.colors['primary_light'], self.colors['electric_blue']]
                 glow_index = (self.animation_frame // 10) % len(glow_colors)
-                self.refresh_button.config(bg=glow_colors[glow_index])
-        
-        # Continue cyberpunk animation
-        self.root.after(self.animation_speed, self.animate_cyberpunk_ui)
+                self.set_widget(self.refresh_button, bg=glow_colors[glow_index])
     
     def manual_refresh(self):
         """Manual refresh with cyberpunk visual feedback"""
-        self.update_departures()
+        if self.fetch_worker:
+            self.fetch_worker.request_fetch()
         
-        # Enhanced button feedback with color cycling
-        original_bg = self.refresh_button.cget('bg')
-        feedback_colors = [self.colors['success'], self.colors['matrix_green'], self.colors['accent']]
+        # Enhanced button feedback with color cycling; a second click restarts it instead of stacking
+        feedback_colors = [self.colors['success'], self.colors['matrix_green'], self.colors['accent'], self.colors['primary']]
+        steps = iter(feedback_colors)
         
-        def cycle_feedback(index=0):
-            if index < len(feedback_colors):
-                self.refresh_button.config(bg=feedback_colors[index])
-                self.root.after(100, lambda: cycle_feedback(index + 1))
-            else:
-                self.refresh_button.config(bg=original_bg)
+        def cycle_feedback(frame):
+            color = next(steps, None)
+            if color is None:
+                return False
+            self.set_widget(self.refresh_button, bg=color)
         
-        cycle_feedback()
+        cycle_feedback(0)
+        self.frame_scheduler.register('refresh_feedback', cycle_feedback, every=2)
+    
+    def shutdown(self):
+        """Stop fetching, flush the history and destroy the window, which also ends the main loop"""
+        if self.snapshot_server:
+            self.snapshot_server.stop()
+        if self.metrics_server:
+            self.metrics_server.stop()
+        if self.feed_url and self.fetch_worker:
+            self.fetch_worker.stop()
+        self.engine.stop()
+        self.frame_scheduler.stop()
+        # quit() alone would leave the window and its pending callbacks alive until interpreter exit
+        self.root.destroy()
     
     def start_monitoring(self):
-        """Start the monitoring thread with better error handling"""
-        def monitor_loop():
-            while True:
-                try:
-                    # Schedule UI update on main thread
-                    self.root.after(0, self.update_departures)
-                    time.sleep(self.update_interval)
-                except Exception as e:
-                    print(f"Monitoring error: {e}")
-                    time.sleep(30)  # Wait longer on error
-        
-        # Start monitoring in background thread
-        monitor_thread = threading.Thread(target=monitor_loop, daemon=True)
-        monitor_thread.start()
-        
-        # Initial update after UI setup
-        self.root.after(2000, self.update_departures)
+        """Start the background fetch worker and the result queue pump"""
+        if self.feed_url:
+            # N displays, one upstream poll: the serving tracker does all MVG requests
+            from bus_tracker_server import FeedClient
+            self.fetch_worker = FeedClient(self.feed_url)
+            self.fetch_worker.start()
+        else:
+            self.fetch_worker = self.engine.start()
+        if self.serve_address:
+            from bus_tracker_server import SnapshotHub, SnapshotServer, parse_address
+            self.snapshot_hub = SnapshotHub()
+            self.snapshot_server = SnapshotServer(parse_address(self.serve_address), self.snapshot_hub,
+                                                  refresh=self.fetch_worker.request_fetch, metrics=self.metrics)
+            self.snapshot_server.start()
+        if self.metrics_address:
+            from bus_tracker_server import MetricsServer, parse_address
+            self.metrics_server = MetricsServer(parse_address(self.metrics_address), self.metrics)
+            self.metrics_server.start()
+        
+        # The main loop only renders what the worker delivers, plus a 1 Hz countdown tick
+        self.root.after(self.result_poll_ms, self.poll_fetch_results)
+        self.root.after(self.tick_ms, self.tick)
 
 def main():
+    parser = argparse.ArgumentParser(description="Munich Bus Tracker - Cyberpunk Edition")
+    parser.add_argument('--watchlist', metavar='FILE',
+                        help="JSON watch list of stations and destinations to track")
+    parser.add_argument('--profile', choices=sorted(PERFORMANCE_PROFILES), default='full',
+                        help="animation budget: full, reduced (5 fps, no font pulse) or static")
+    parser.add_argument('--serve', metavar='[HOST:]PORT',
+                        help="serve snapshots over HTTP/SSE so other displays can use --feed")
+    parser.add_argument('--feed', metavar='URL',
+                        help="show snapshots from another tracker's --serve endpoint instead of polling MVG")
+    parser.add_argument('--no-history', action='store_true',
+                        help="do not record observed departures to the on-disk history")
+    parser.add_argument('--predict', type=float, metavar='CONFIDENCE',
+                        help="suggest leave times from recorded delays, e.g. 0.95 (requires numpy)")
+    parser.add_argument('--metrics', metavar='[HOST:]PORT',
+                        help="serve Prometheus-style timing metrics on /metrics")
+    parser.add_argument('--renderer', choices=('widgets', 'canvas'), default='widgets',
+                        help="draw the top panels as nested widgets or on a single canvas (fewer relayouts)")
+    parser.add_argument('--debug-overlay', action='store_true',
+                        help="start with the timing overlay shown (F12 toggles it)")
+    parser.add_argument('--concurrency', choices=('asyncio', 'threads'), default='asyncio',
+                        help="run polls and fetches as asyncio tasks with timeouts, or on a plain worker thread")
+    parser.add_argument('--trace-startup', action='store_true',
+                        help="print import, UI build and first-paint times to stderr")
+    add_source_arguments(parser)
+    args = parser.parse_args()
+    if args.predict is not None:
+        if not 0.5 <= args.predict < 1:
+            parser.error("--predict must be between 0.5 and 1")
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            parser.error("--predict requires numpy (pip install numpy)")
+    
+    startup_trace = StartupTrace(IMPORT_STARTED)
+    startup_trace.mark('imports', at=IMPORTS_DONE)
+    watch_list = load_watch_list(args.watchlist) if args.watchlist else None
+    source, clock = source_from_args(args, watch_list)
+    
     root = tk.Tk()
-    app = MunichBusTracker(root)
+    app = MunichBusTracker(root, watch_list=watch_list, profile=args.profile, history=not args.no_history,
+                           predict_confidence=args.predict, serve=args.serve, feed=args.feed,
+                           source=source, clock=clock, metrics_address=args.metrics,
+                           debug_overlay=args.debug_overlay, timetable=timetable_from_args(args),
+                           renderer=args.renderer, startup_trace=startup_trace,
+                           print_startup_trace=args.trace_startup, concurrency=args.concurrency)
+    root.protocol('WM_DELETE_WINDOW', app.shutdown)
     root.mainloop()
 
 if __name__ == "__main__":
@@ -0,0 +1,66 @@
+"""TrackerEngine behaviour that spans the fetch, the timetable fallback and the saved snapshot"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from bus_tracker_core import TrackerEngine, TIMETABLE_ERROR, api_error
+from bus_tracker_sources import SyntheticSource, VirtualClock
+
+
+class FlakyLiveSource(SyntheticSource):
+    """Synthetic departures standing in for live MVG that can be switched into an outage"""
+
+    live = True
+    down = False
+
+    def raw_departures(self, station_id, limit=10, offset=0, transport_types=None):
+        if self.down:
+            raise api_error("MVG API unavailable")
+        return super().raw_departures(station_id, limit, offset, transport_types)
+
+
+class StubTimetable:
+    """Every station covered, one scheduled departure every ten minutes"""
+
+    def covers(self, station):
+        return True
+
+    def departures(self, station, after, limit=10, transport_types=None, horizon=6 * 3600):
+        return [{'time': int(after) + 600 * i, 'planned': int(after) + 600 * i, 'line': 'X201',
+                 'destination': 'Garching, Forschungszentrum (U)', 'type': 'Regionalbus', 'icon': 'mdi:bus',
+                 'cancelled': False, 'messages': [], 'scheduled': True} for i in range(1, limit + 1)]
+
+
+class SnapshotStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        patcher = mock.patch.dict(os.environ, {'XDG_CACHE_HOME': self.directory.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_timetable_fallback_keeps_the_last_live_snapshot(self):
+        clock = VirtualClock(start=1_700_000_000, speed=None)
+        source = FlakyLiveSource(clock)
+        engine = TrackerEngine(history=False, source=source, clock=clock, timetable=StubTimetable())
+        self.addCleanup(engine.stop)
+
+        live = engine.fetch_snapshot()
+        self.assertIsNone(live.error)
+        with open(engine.snapshot_store.path, 'rb') as f:
+            saved = f.read()
+
+        source.down = True
+        engine.departure_cache.clear()
+        clock.advance(60)
+        fallback = engine.fetch_snapshot()
+        self.assertEqual(fallback.error, TIMETABLE_ERROR)
+        self.assertTrue(fallback.departures)
+        with open(engine.snapshot_store.path, 'rb') as f:
+            self.assertEqual(f.read(), saved)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+"""Record and replay through TrackerEngine, as the --record and --replay options wire them"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from bus_tracker_core import TrackerEngine, StationCache, default_watch_list
+from bus_tracker_sources import SyntheticSource, RecordingSource, ReplaySource, VirtualClock
+
+
+class LiveSyntheticSource(SyntheticSource):
+    """Synthetic departures standing in for live MVG, so the engine uses its on-disk station cache"""
+
+    live = True
+
+    def station(self, query):
+        raise AssertionError(f"{query} should have come from the station cache")
+
+
+class RecordReplayTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        environ = {'XDG_CACHE_HOME': self.directory.name, 'XDG_DATA_HOME': self.directory.name}
+        patcher = mock.patch.dict(os.environ, environ)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.recording = os.path.join(self.directory.name, 'recording.jsonl')
+
+    def test_replay_of_a_recording_made_with_a_warm_station_cache(self):
+        watch_list = default_watch_list()
+        StationCache().put(watch_list[0].station, {'id': 'de:09162:1108', 'name': watch_list[0].station})
+
+        clock = VirtualClock(start=1_700_000_000, speed=None)
+        source = RecordingSource(LiveSyntheticSource(clock), self.recording, clock)
+        engine = TrackerEngine(watch_list, history=False, source=source, clock=clock)
+        self.assertTrue(engine.load_cached_stations())
+        recorded = engine.fetch_snapshot()
+        engine.stop()
+        self.assertIsNone(recorded.error)
+        self.assertTrue(recorded.departures)
+
+        replay = ReplaySource(self.recording)
+        replay.clock = clock = VirtualClock(replay.start, None, end=replay.end)
+        engine = TrackerEngine(watch_list, history=False, source=replay, clock=clock)
+        replayed = engine.fetch_snapshot()
+        engine.stop()
+        self.assertIsNone(replayed.error)
+        self.assertEqual([(dep.line, dep.time) for dep in replayed.departures],
+                         [(dep.line, dep.time) for dep in recorded.departures])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,28 @@
+"""GTFS import into the offline timetable index"""
+import os
+import unittest
+from datetime import date, datetime
+
+from bus_tracker_core import default_watch_list
+from bus_tracker_timetable import build_timetable, feed_timezone, GtfsFeed
+
+FEED = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'gtfs')
+
+
+class BuildTimetableTest(unittest.TestCase):
+
+    def test_rows_without_times_are_skipped(self):
+        # T1 passes Parkring Süd as a non-timepoint stop with both times empty; only T2 has a time there
+        timetable = build_timetable(FEED, default_watch_list(), first_day=date(2024, 3, 1), days=3)
+        self.assertEqual(len(timetable), 3)
+        feed = GtfsFeed(FEED)
+        tz = feed_timezone(feed)
+        feed.close()
+        departures = timetable.departures('Parkring Süd', datetime(2024, 3, 1, tzinfo=tz).timestamp(), limit=5,
+                                         horizon=3 * 24 * 3600)
+        self.assertEqual([datetime.fromtimestamp(dep['time'], tz).strftime('%d %H:%M') for dep in departures],
+                         ['01 07:10', '02 07:10', '03 07:10'])
+
+
+if __name__ == '__main__':
+    unittest.main()